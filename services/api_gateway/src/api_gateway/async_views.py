@@ -0,0 +1,335 @@
+import json
+import asyncio
+import logging
+import weakref
+
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import JsonResponse, StreamingHttpResponse
+from django_ratelimit.core import is_ratelimited
+
+from .http_clients import get_async_service_client
+from .models import NotificationStatus
+from .outbox import build_outbox_row
+from .idempotency import arelease_request, areserve_request
+from .rabbitmq import get_confirming_publisher, get_publisher_pool
+from .status_store import aread_statuses, decode_status
+from .status_stream import TERMINAL_STATUSES, StatusSubscriber, format_event
+from .views import (
+    STATUS_TTL,
+    build_notification_message,
+    check_circuit_breaker,
+    circuit_breaker,
+    get_request_id,
+    notification_record,
+    notification_properties,
+    record_failure,
+    record_success,
+    release_notification,
+    persisted_status,
+    template_cache,
+    user_contact_cache,
+    validate_notification_data,
+)
+
+logger = logging.getLogger(__name__)
+
+# Async clients hold connections bound to one event loop. An ASGI server runs
+# a single loop per process, but under WSGI every request to an async view
+# gets a fresh loop, so clients are kept per loop (see http_clients).
+_async_redis_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis_client():
+    """Return the redis.asyncio client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_redis_clients.get(loop)
+    if client is None:
+        client = _async_redis_clients[loop] = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=0,
+            decode_responses=True
+        )
+    return client
+
+
+_status_subscribers = weakref.WeakKeyDictionary()
+
+
+def get_status_subscriber():
+    """Return the status channel subscriber shared by streams on the running loop"""
+    loop = asyncio.get_running_loop()
+    subscriber = _status_subscribers.get(loop)
+    if subscriber is None:
+        subscriber = _status_subscribers[loop] = StatusSubscriber(
+            get_async_redis_client(), settings.NOTIFICATION_STATUS_CHANNEL
+        )
+    return subscriber
+
+
+async def check_circuit_breaker_async(service_name):
+    """Check the circuit breaker; a locally closed breaker needs no thread hop"""
+    if circuit_breaker.is_closed_locally(service_name):
+        return True
+    return await sync_to_async(check_circuit_breaker, thread_sensitive=False)(service_name)
+
+
+async def record_success_async(service_name):
+    """Record a success; a no-op while the breaker is closed locally"""
+    if not circuit_breaker.is_closed_locally(service_name):
+        await sync_to_async(record_success, thread_sensitive=False)(service_name)
+
+
+async def fetch_user_exists_async(user_id):
+    """Ask the user service whether a user exists (circuit breaker protected)"""
+    response = await get_async_service_client('user_service').get(f"/users/{user_id}/contact")
+    if response.status_code != 200:
+        await sync_to_async(record_failure, thread_sensitive=False)('user_service')
+        logger.error(f"User service error: {response.status_code}")
+        return False if response.status_code == 404 else None
+    await record_success_async('user_service')
+    return True
+
+
+async def fetch_template_exists_async(template_code):
+    """Ask the template service whether a template exists (circuit breaker protected)"""
+    response = await get_async_service_client('template_service').get(f"/templates/{template_code}/exists/")
+    if response.status_code != 200:
+        await sync_to_async(record_failure, thread_sensitive=False)('template_service')
+        logger.error(f"Template service error: {response.status_code}")
+        return False if response.status_code == 404 else None
+    await record_success_async('template_service')
+    return True
+
+
+async def validate_user_exists_async(user_id):
+    """Validate user exists, served from the lookup cache when possible"""
+    return await user_contact_cache.aget_or_load(
+        user_id, lambda: fetch_user_exists_async(user_id), get_async_redis_client()
+    )
+
+
+async def validate_template_exists_async(template_code):
+    """Validate template exists, served from the lookup cache when possible"""
+    return await template_cache.aget_or_load(
+        template_code, lambda: fetch_template_exists_async(template_code), get_async_redis_client()
+    )
+
+
+async def publish_async(routing_key, request_id, message, token):
+    """Publish without blocking the event loop.
+
+    Returns False when the broker confirm is still pending after
+    RABBITMQ_CONFIRM_TIMEOUT; a nack raises PublishNacked.
+    """
+    if not settings.RABBITMQ_PUBLISHER_CONFIRMS:
+        await sync_to_async(get_publisher_pool().publish, thread_sensitive=False)(
+            exchange='notifications.direct',
+            routing_key=routing_key,
+            body=json.dumps(message),
+            properties=notification_properties(request_id, message.get('priority'))
+        )
+        return True
+
+    future = get_confirming_publisher().publish(
+        exchange='notifications.direct',
+        routing_key=routing_key,
+        body=json.dumps(message),
+        properties=notification_properties(request_id, message.get('priority')),
+        on_nack=lambda reason: release_notification(request_id, token, reason)
+    )
+    try:
+        # shield() keeps a timeout from cancelling the publisher's Future
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=settings.RABBITMQ_CONFIRM_TIMEOUT)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+async def send_notification_async(request):
+    """Async send path: user and template lookups run concurrently"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+
+    ratelimited = await sync_to_async(is_ratelimited)(
+        request=request, group='api_gateway.send_notification_async',
+        key='user_or_ip', rate='100/m', increment=True
+    )
+    if ratelimited:
+        return JsonResponse({'success': False, 'error': 'Rate limit exceeded'}, status=429)
+
+    logger.info(f"Async notification request from {request.META.get('REMOTE_ADDR')}")
+
+    try:
+        data = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON body'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'Request body must be an object'}, status=400)
+
+    validation_errors = validate_notification_data(data)
+    if validation_errors:
+        logger.warning(f"Validation errors: {validation_errors}")
+        return JsonResponse({
+            'success': False,
+            'error': 'Validation failed',
+            'details': validation_errors
+        }, status=400)
+
+    notification_type = data.get('notification_type')
+
+    if not await check_circuit_breaker_async('user_service'):
+        logger.warning("Circuit breaker is open for user service, rejecting request")
+        return JsonResponse({
+            'success': False,
+            'error': 'Service temporarily unavailable'
+        }, status=503)
+
+    request_id = get_request_id(data)
+    async_redis_client = get_async_redis_client()
+
+    token = await areserve_request(async_redis_client, request_id, STATUS_TTL, record=notification_record(data))
+    if token is None:
+        logger.info(f"Duplicate request detected: {request_id}")
+        return JsonResponse({
+            'success': False,
+            'error': 'Duplicate request',
+            'request_id': request_id
+        }, status=409)
+
+    async def release(error, notification_status=NotificationStatus.failed):
+        await arelease_request(async_redis_client, request_id, token, error, STATUS_TTL, notification_status)
+
+    try:
+        user_ok, template_ok = await asyncio.gather(
+            validate_user_exists_async(data.get('user_id')),
+            validate_template_exists_async(data.get('template_code'))
+        )
+        if not user_ok:
+            await release('User validation failed')
+            return JsonResponse({'success': False, 'error': 'User validation failed'}, status=400)
+        if not template_ok:
+            await release('Template validation failed')
+            return JsonResponse({'success': False, 'error': 'Template validation failed'}, status=400)
+
+        if settings.NOTIFICATION_OUTBOX_ENABLED:
+            try:
+                await sync_to_async(build_outbox_row(request_id, data).save)()
+            except IntegrityError:
+                # Drop the reservation and put back the stored notification's status
+                notification_status, error = await sync_to_async(persisted_status)(request_id)
+                await release(error, notification_status)
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Duplicate request',
+                    'request_id': request_id
+                }, status=409)
+            return JsonResponse({
+                'success': True,
+                'message': 'Notification accepted',
+                'request_id': request_id,
+                'type': notification_type
+            }, status=202)
+
+        confirmed = await publish_async(
+            f'{notification_type}.queue', request_id, build_notification_message(request_id, data), token
+        )
+        if not confirmed:
+            logger.warning(f"Broker confirm still pending: {request_id}")
+            return JsonResponse({
+                'success': True,
+                'message': 'Notification accepted, broker confirmation pending',
+                'request_id': request_id,
+                'type': notification_type
+            }, status=202)
+
+        logger.info(f"Notification queued: {request_id}")
+        return JsonResponse({
+            'success': True,
+            'message': 'Notification queued successfully',
+            'request_id': request_id,
+            'type': notification_type
+        }, status=200)
+
+    except Exception as e:
+        await sync_to_async(record_failure, thread_sensitive=False)('general')
+        logger.error(f"Error processing notification: {str(e)}")
+        await release(str(e))
+        return JsonResponse({
+            'success': False,
+            'error': 'Internal server error'
+        }, status=500)
+
+
+# csrf_exempt() returns a sync wrapper on Django 4.2, so set the flag directly
+send_notification_async.csrf_exempt = True
+
+
+async def stream_notification_status(request):
+    """Stream status changes for ?request_ids=a,b,c as server-sent events.
+
+    Sends the current status of each id first, then every change, and ends
+    once all ids are delivered or failed or after STATUS_STREAM_TIMEOUT.
+    Needs the ASGI server; under WSGI the stream would never be flushed.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+
+    request_ids = list(dict.fromkeys(
+        request_id.strip() for request_id in request.GET.get('request_ids', '').split(',') if request_id.strip()
+    ))
+    if not request_ids:
+        return JsonResponse({'success': False, 'error': 'request_ids is required'}, status=400)
+    if len(request_ids) > settings.STATUS_STREAM_MAX_IDS:
+        return JsonResponse({
+            'success': False,
+            'error': f'At most {settings.STATUS_STREAM_MAX_IDS} request_ids per stream'
+        }, status=400)
+
+    # Subscribe before reading current statuses so no change falls in between
+    subscriber = get_status_subscriber()
+    queue = subscriber.subscribe(request_ids)
+    try:
+        current = await aread_statuses(get_async_redis_client(), request_ids)
+    except Exception:
+        subscriber.unsubscribe(request_ids, queue)
+        raise
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.STATUS_STREAM_TIMEOUT
+        open_ids = set(request_ids)
+        try:
+            for request_id, stored_status in zip(request_ids, current):
+                if stored_status:
+                    status_data = decode_status(request_id, stored_status)
+                    yield format_event(status_data)
+                    if status_data['status'] in TERMINAL_STATUSES:
+                        open_ids.discard(request_id)
+
+            while open_ids:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    status_data = await asyncio.wait_for(
+                        queue.get(), timeout=min(settings.STATUS_STREAM_HEARTBEAT, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(status_data)
+                if status_data.get('status') in TERMINAL_STATUSES:
+                    open_ids.discard(status_data.get('notification_id'))
+
+            yield format_event({'open': sorted(open_ids)}, event='end')
+        finally:
+            subscriber.unsubscribe(request_ids, queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
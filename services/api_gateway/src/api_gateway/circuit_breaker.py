@@ -0,0 +1,137 @@
+import time
+import threading
+
+# All scripts take KEYS[1] = circuit_breaker:{service} and return
+# {state, failures, last_failure_time}; CHECK_SCRIPT prepends allowed (0/1).
+# Numbers are returned as strings because Lua replies truncate floats.
+
+# ARGV: now, timeout
+CHECK_SCRIPT = """
+local fields = redis.call('HMGET', KEYS[1], 'state', 'failures', 'last_failure_time')
+local state = fields[1] or 'closed'
+local failures = fields[2] or '0'
+local last_failure_time = fields[3] or '0'
+local allowed = 1
+if state == 'open' then
+    if tonumber(ARGV[1]) - tonumber(last_failure_time) > tonumber(ARGV[2]) then
+        state = 'half-open'
+        redis.call('HSET', KEYS[1], 'state', state)
+    else
+        allowed = 0
+    end
+end
+return {allowed, state, failures, last_failure_time}
+"""
+
+# ARGV: now, threshold
+FAILURE_SCRIPT = """
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if failures >= tonumber(ARGV[2]) then
+    state = 'open'
+end
+redis.call('HSET', KEYS[1], 'state', state, 'last_failure_time', ARGV[1])
+return {state, tostring(failures), ARGV[1]}
+"""
+
+SUCCESS_SCRIPT = """
+local fields = redis.call('HMGET', KEYS[1], 'state', 'failures', 'last_failure_time')
+local state = fields[1] or 'closed'
+local failures = fields[2] or '0'
+if state == 'half-open' then
+    state = 'closed'
+    failures = '0'
+    redis.call('HSET', KEYS[1], 'state', state, 'failures', failures)
+end
+return {state, failures, fields[3] or '0'}
+"""
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _parse_state(reply):
+    state, failures, last_failure_time = (_decode(value) for value in reply)
+    return {
+        'failures': int(failures),
+        'last_failure_time': float(last_failure_time),
+        'state': state
+    }
+
+
+class CircuitBreaker:
+    """Redis-backed circuit breaker shared by all gateway processes.
+
+    Every transition runs as one Lua script, so concurrent workers never
+    overwrite each other's counters. Each process keeps the last state it
+    saw for snapshot_ttl seconds; while that snapshot is closed, checks and
+    successes are answered locally without a Redis call. A breaker opened
+    by another process is therefore noticed within snapshot_ttl.
+    """
+
+    def __init__(self, redis_getter, threshold, timeout, snapshot_ttl):
+        self._redis_getter = redis_getter
+        self.threshold = threshold
+        self.timeout = timeout
+        self.snapshot_ttl = snapshot_ttl
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def _key(self, service_name):
+        return f"circuit_breaker:{service_name}"
+
+    def _run(self, script_source, service_name, *args):
+        redis_client = self._redis_getter()
+        script = redis_client.register_script(script_source)
+        return script(keys=[self._key(service_name)], args=list(args))
+
+    def _remember(self, service_name, state):
+        with self._lock:
+            self._snapshots[service_name] = (state, time.monotonic() + self.snapshot_ttl)
+        return state
+
+    def is_closed_locally(self, service_name):
+        """Return True when a fresh local snapshot says the breaker is closed"""
+        with self._lock:
+            snapshot = self._snapshots.get(service_name)
+        if snapshot is None:
+            return False
+        state, expires_at = snapshot
+        return state['state'] == 'closed' and expires_at > time.monotonic()
+
+    def state(self, service_name):
+        """Read the shared state from Redis"""
+        state = self._redis_getter().hgetall(self._key(service_name))
+        if not state:
+            return {'failures': 0, 'last_failure_time': 0, 'state': 'closed'}
+        state = {_decode(key): _decode(value) for key, value in state.items()}
+        return {
+            'failures': int(state.get('failures', 0)),
+            'last_failure_time': float(state.get('last_failure_time', 0)),
+            'state': state.get('state', 'closed')
+        }
+
+    def allow(self, service_name):
+        """Return whether a request may go through, moving open to half-open after the timeout"""
+        if self.is_closed_locally(service_name):
+            return True
+        allowed, *state = self._run(CHECK_SCRIPT, service_name, time.time(), self.timeout)
+        self._remember(service_name, _parse_state(state))
+        return bool(allowed)
+
+    def record_failure(self, service_name):
+        """Count a failure and open the breaker at the threshold"""
+        state = self._run(FAILURE_SCRIPT, service_name, time.time(), self.threshold)
+        return self._remember(service_name, _parse_state(state))
+
+    def record_success(self, service_name):
+        """Close a half-open breaker; a no-op while the local snapshot is closed"""
+        if self.is_closed_locally(service_name):
+            return
+        state = self._run(SUCCESS_SCRIPT, service_name)
+        self._remember(service_name, _parse_state(state))
+
+    def clear_local(self):
+        with self._lock:
+            self._snapshots.clear()
@@ -0,0 +1,133 @@
+import time
+import logging
+
+from django.conf import settings
+
+from .rabbitmq import RETRY_COUNT_HEADER
+
+logger = logging.getLogger(__name__)
+
+DEAD_LETTER_QUEUE = 'failed.queue'
+
+
+class RateLimiter:
+    """Space calls evenly so at most rate of them start per second (no limit when rate is falsy)"""
+
+    def __init__(self, rate=None):
+        self.interval = 1 / rate if rate else 0
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+def death_info(properties):
+    """Where and why a dead-lettered message died, from its newest x-death entry"""
+    deaths = (properties.headers or {}).get('x-death') or []
+    death = deaths[0] if deaths else {}
+    routing_keys = death.get('routing-keys') or []
+    return {
+        'reason': death.get('reason', 'unknown'),
+        'queue': death.get('queue', 'unknown'),
+        'exchange': death.get('exchange'),
+        'routing_key': routing_keys[0] if routing_keys else None,
+    }
+
+
+def group_key(info):
+    return f"{info['reason']}:{info['queue']}"
+
+
+def replay_properties(properties):
+    """Bump the replay count header and reset the retry count, so a replay gets every retry tier again"""
+    headers = dict(properties.headers or {})
+    headers['x-replay-count'] = headers.get('x-replay-count', 0) + 1
+    headers.pop(RETRY_COUNT_HEADER, None)
+    properties.headers = headers
+    return properties
+
+
+def replay_dead_letters(channel, publisher, groups=None, dry_run=True, limit=None, batch_size=None,
+                        rate=None, concurrency=None, progress=None):
+    """Drain failed.queue in batches, republishing the selected groups.
+
+    Messages are grouped by group_key (x-death reason and queue); groups is
+    a collection of keys to replay, or None for every group. Replayed
+    messages go back to their original exchange and routing key through
+    publisher (a ConfirmingPublisher) at most rate per second, with at most
+    concurrency awaiting their confirm. A message is acked only once its
+    copy is confirmed. Skipped and unconfirmed messages stay unacked until
+    the end and are then returned to the queue, so each message is seen at
+    most once per run and a dry run changes nothing. progress is called
+    with the summary after every batch.
+
+    Returns {group: {'messages', 'replayed', 'failed'}}.
+    """
+    batch_size = batch_size or settings.DLQ_REPLAY_BATCH_SIZE
+    concurrency = concurrency or settings.DLQ_REPLAY_CONCURRENCY
+    limiter = RateLimiter(rate if rate is not None else settings.DLQ_REPLAY_RATE)
+
+    depth = channel.queue_declare(queue=DEAD_LETTER_QUEUE, passive=True).method.message_count
+    remaining = depth if limit is None else min(limit, depth)
+    summary = {}
+    held = []  # delivery tags returned to the queue at the end
+
+    def settle(in_flight):
+        for delivery_tag, key, future in in_flight:
+            try:
+                future.result(timeout=settings.RABBITMQ_CONFIRM_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Dead letter replay not confirmed for group {key}: {e}")
+                summary[key]['failed'] += 1
+                held.append(delivery_tag)
+                continue
+            channel.basic_ack(delivery_tag=delivery_tag)
+            summary[key]['replayed'] += 1
+        in_flight.clear()
+
+    try:
+        while remaining > 0:
+            batch = []
+            while len(batch) < min(batch_size, remaining):
+                method, properties, body = channel.basic_get(queue=DEAD_LETTER_QUEUE)
+                if method is None:
+                    break
+                batch.append((method, properties, body))
+            if not batch:
+                break
+            remaining -= len(batch)
+
+            in_flight = []
+            for method, properties, body in batch:
+                info = death_info(properties)
+                key = group_key(info)
+                stats = summary.setdefault(key, {'messages': 0, 'replayed': 0, 'failed': 0})
+                stats['messages'] += 1
+                if dry_run or (groups is not None and key not in groups) or info['routing_key'] is None:
+                    held.append(method.delivery_tag)
+                    continue
+                limiter.wait()
+                future = publisher.publish(
+                    exchange=info['exchange'] or '',
+                    routing_key=info['routing_key'],
+                    body=body,
+                    properties=replay_properties(properties)
+                )
+                in_flight.append((method.delivery_tag, key, future))
+                if len(in_flight) >= concurrency:
+                    settle(in_flight)
+            settle(in_flight)
+
+            if progress is not None:
+                progress(summary)
+    finally:
+        if held and channel.is_open:
+            for delivery_tag in held:
+                channel.basic_nack(delivery_tag=delivery_tag, requeue=True)
+    return summary
@@ -0,0 +1,118 @@
+import json
+import base64
+import binascii
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Notification, NotificationStatus
+
+# Fields a client may request with ?fields=; variables and metadata are
+# only returned when asked for explicitly
+HISTORY_FIELDS = {
+    'notification_id', 'status', 'user_id', 'notification_type', 'template_code',
+    'variables', 'priority', 'metadata', 'error_message', 'published_at',
+    'created_at', 'updated_at',
+}
+DEFAULT_HISTORY_FIELDS = [
+    'notification_id', 'status', 'notification_type', 'template_code', 'created_at', 'updated_at',
+]
+
+
+def recent_notifications():
+    """Notifications within NOTIFICATION_HOT_WINDOW_DAYS, so queries skip old partitions"""
+    queryset = Notification.objects.all()
+    if settings.NOTIFICATION_HOT_WINDOW_DAYS:
+        queryset = queryset.filter(
+            created_at__gte=timezone.now() - timedelta(days=settings.NOTIFICATION_HOT_WINDOW_DAYS)
+        )
+    return queryset
+
+
+class HistoryQueryError(ValueError):
+    """Raised for invalid history filters, fields or cursors"""
+
+
+def encode_cursor(created_at, pk):
+    """Encode the keyset position after a row as an opaque cursor"""
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        created_at = parse_datetime(created_at)
+    except (binascii.Error, ValueError, TypeError):
+        raise HistoryQueryError('Invalid cursor')
+    if created_at is None or not isinstance(pk, int):
+        raise HistoryQueryError('Invalid cursor')
+    return created_at, pk
+
+
+def parse_fields(fields_param):
+    if not fields_param:
+        return list(DEFAULT_HISTORY_FIELDS)
+    fields = list(dict.fromkeys(field.strip() for field in fields_param.split(',') if field.strip()))
+    unknown = set(fields) - HISTORY_FIELDS
+    if unknown:
+        raise HistoryQueryError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def _parse_time(value, name):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise HistoryQueryError(f'{name} must be an ISO 8601 datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def history_page(user_id=None, statuses=None, created_after=None, created_before=None,
+                 fields=None, cursor=None, limit=50):
+    """Return one page of notifications, newest first, and the next cursor.
+
+    Pages are keyed on (created_at, id) instead of OFFSET, so every page
+    is a bounded index range scan however deep the client pages. A user_id
+    or a status filter is required so the query can walk the (user_id,
+    created_at, id) or (status, created_at, id) index in page order.
+    Without created_after only the hot window is searched.
+    """
+    if not user_id and not statuses:
+        raise HistoryQueryError('user_id or status is required')
+    for notification_status in statuses or []:
+        if notification_status not in NotificationStatus.__members__:
+            raise HistoryQueryError(f'Unknown status: {notification_status}')
+
+    fields = fields or list(DEFAULT_HISTORY_FIELDS)
+    queryset = Notification.objects.all() if created_after else recent_notifications()
+    if user_id:
+        queryset = queryset.filter(user_id=user_id)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    if created_after:
+        queryset = queryset.filter(created_at__gte=_parse_time(created_after, 'created_after'))
+    if created_before:
+        queryset = queryset.filter(created_at__lt=_parse_time(created_before, 'created_before'))
+    if cursor:
+        cursor_created_at, cursor_pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=cursor_created_at) | Q(created_at=cursor_created_at, pk__lt=cursor_pk)
+        )
+
+    # One extra row tells whether another page exists
+    rows = list(
+        queryset.order_by('-created_at', '-pk')
+        .values('pk', 'created_at', *[field for field in fields if field != 'created_at'])[:limit + 1]
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['pk'])
+
+    return [{field: row[field] for field in fields} for row in rows], next_cursor
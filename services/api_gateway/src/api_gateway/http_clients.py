@@ -0,0 +1,103 @@
+import os
+import asyncio
+import threading
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ServiceClient:
+    """Keep-alive HTTP client for one downstream service.
+
+    Wraps a requests.Session whose adapter keeps up to pool_size idle
+    connections to the service. Connection errors are retried for every
+    method; 502/503/504 responses only for idempotent methods.
+    """
+
+    def __init__(self, name, base_url, pool_size=10, timeout=5, connect_timeout=1, retries=2):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, timeout)
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=settings.HTTP_RETRY_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, f"{self.base_url}{path}", **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def _service_config(name):
+    try:
+        return settings.DOWNSTREAM_SERVICES[name]
+    except KeyError:
+        raise ValueError(f"Unknown downstream service: {name}")
+
+
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+
+def get_service_client(name):
+    """Return the shared ServiceClient for a downstream service in this process"""
+    global _clients, _clients_pid
+    pid = os.getpid()
+    client = _clients.get(name) if _clients_pid == pid else None
+    if client is None:
+        with _clients_lock:
+            if _clients_pid != pid:
+                # Never share pooled sockets with a parent process
+                _clients, _clients_pid = {}, pid
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = ServiceClient(name, **_service_config(name))
+    return client
+
+
+# AsyncClients are bound to the event loop they were first used on
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_service_client(name):
+    """Return the httpx.AsyncClient for a downstream service on the running loop"""
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    client = clients.get(name)
+    if client is None:
+        config = _service_config(name)
+        pool_size = config.get('pool_size', 10)
+        client = clients[name] = httpx.AsyncClient(
+            base_url=config['base_url'],
+            timeout=httpx.Timeout(config.get('timeout', 5), connect=config.get('connect_timeout', 1)),
+            # httpx retries connection failures only
+            transport=httpx.AsyncHTTPTransport(
+                retries=config.get('retries', 2),
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            ),
+        )
+    return client
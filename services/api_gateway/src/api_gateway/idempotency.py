@@ -0,0 +1,150 @@
+import json
+import uuid
+
+from django.conf import settings
+
+from .models import NotificationStatus
+from .status_store import encode_status, status_key, status_message
+
+# The reservation lives in the status:{request_id} hash itself as its k
+# field (see status_store), so reserving and writing the pending status is
+# a single key. Both scripts also publish the status they write, which feeds
+# the status streams (see status_stream), and append it to the status log
+# stream, which the write-behind persister drains (see status_persistence).
+# A reservation may carry the notification's fields so the persister can
+# create its row. Reservations made before the combined key still block
+# through their idempotency:{request_id} key until it expires.
+
+# KEYS: status key, legacy idempotency key, status log.
+# ARGV: token, status code, epoch, ttl, channel, log maxlen, status message,
+#       notification record
+RESERVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+local kind = redis.call('TYPE', KEYS[1])['ok']
+if kind == 'hash' and redis.call('HEXISTS', KEYS[1], 'k') == 1 then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'k', ARGV[1], 's', ARGV[2], 't', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('PUBLISH', ARGV[5], ARGV[7])
+if ARGV[8] ~= '' then
+    redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[6], '*', 'status', ARGV[7], 'notification', ARGV[8])
+else
+    redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[6], '*', 'status', ARGV[7])
+end
+return 1
+"""
+
+# KEYS: status key, status log.
+# ARGV: token, status code, epoch, error, ttl, channel, log maxlen, status message
+RELEASE_SCRIPT = """
+if redis.call('TYPE', KEYS[1])['ok'] ~= 'hash' or redis.call('HGET', KEYS[1], 'k') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 's', ARGV[2], 't', ARGV[3])
+if ARGV[4] ~= '' then
+    redis.call('HSET', KEYS[1], 'e', ARGV[4])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('PUBLISH', ARGV[6], ARGV[8])
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[7], '*', 'status', ARGV[8])
+return 1
+"""
+
+
+def _reserve(request_id, token, ttl, record=None):
+    code, epoch, _ = encode_status(NotificationStatus.pending)
+    keys = [status_key(request_id), f"idempotency:{request_id}", settings.NOTIFICATION_STATUS_LOG_STREAM]
+    args = [
+        token, code, epoch, ttl, settings.NOTIFICATION_STATUS_CHANNEL, settings.NOTIFICATION_STATUS_LOG_MAXLEN,
+        status_message(request_id, NotificationStatus.pending, timestamp=epoch), json.dumps(record) if record else ''
+    ]
+    return {'keys': keys, 'args': args}
+
+
+def _release(request_id, token, error, ttl, notification_status=NotificationStatus.failed):
+    code, epoch, error = encode_status(notification_status, error)
+    keys = [status_key(request_id), settings.NOTIFICATION_STATUS_LOG_STREAM]
+    args = [
+        token, code, epoch, error, ttl, settings.NOTIFICATION_STATUS_CHANNEL, settings.NOTIFICATION_STATUS_LOG_MAXLEN,
+        status_message(request_id, notification_status, error, epoch)
+    ]
+    return {'keys': keys, 'args': args}
+
+
+def new_token():
+    """Return a token that identifies one reservation of a request_id"""
+    return uuid.uuid4().hex
+
+
+def reserve_request(redis_client, request_id, ttl, record=None):
+    """Reserve request_id and store its pending status in one atomic call.
+
+    Returns the reservation token, or None when the request_id is already
+    reserved (a duplicate request).
+    """
+    token = new_token()
+    script = redis_client.register_script(RESERVE_SCRIPT)
+    if script(**_reserve(request_id, token, ttl, record)):
+        return token
+    return None
+
+
+def release_request(redis_client, request_id, token, error, ttl, notification_status=NotificationStatus.failed):
+    """Release a reservation and store the failed status with error.
+
+    Only the holder of token can release, so a late failure never clears a
+    newer reservation of the same request_id. A duplicate of a stored
+    notification passes that notification's own status instead of failed.
+    """
+    script = redis_client.register_script(RELEASE_SCRIPT)
+    return bool(script(**_release(request_id, token, error, ttl, notification_status)))
+
+
+def reserve_requests(redis_client, request_ids, ttl, records=None):
+    """Reserve many request_ids in one pipeline.
+
+    records optionally maps a request_id to the notification's fields.
+    Returns a dict of request_id to token, with None for duplicates.
+    """
+    records = records or {}
+    script = redis_client.register_script(RESERVE_SCRIPT)
+    tokens = {request_id: new_token() for request_id in request_ids}
+    pipe = redis_client.pipeline(transaction=False)
+    for request_id, token in tokens.items():
+        script(**_reserve(request_id, token, ttl, records.get(request_id)), client=pipe)
+    reserved = pipe.execute() if tokens else []
+    return {
+        request_id: token if ok else None
+        for (request_id, token), ok in zip(tokens.items(), reserved)
+    }
+
+
+def release_requests(redis_client, releases, ttl):
+    """Release many reservations in one pipeline; releases holds (request_id, token, error)"""
+    if not releases:
+        return
+    script = redis_client.register_script(RELEASE_SCRIPT)
+    pipe = redis_client.pipeline(transaction=False)
+    for request_id, token, error in releases:
+        script(**_release(request_id, token, error, ttl), client=pipe)
+    pipe.execute()
+
+
+async def areserve_request(redis_client, request_id, ttl, record=None):
+    """Async variant of reserve_request for a redis.asyncio client"""
+    token = new_token()
+    script = redis_client.register_script(RESERVE_SCRIPT)
+    if await script(**_reserve(request_id, token, ttl, record)):
+        return token
+    return None
+
+
+async def arelease_request(redis_client, request_id, token, error, ttl, notification_status=NotificationStatus.failed):
+    """Async variant of release_request for a redis.asyncio client"""
+    script = redis_client.register_script(RELEASE_SCRIPT)
+    return bool(await script(**_release(request_id, token, error, ttl, notification_status)))
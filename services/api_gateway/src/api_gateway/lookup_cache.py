@@ -0,0 +1,173 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_POSITIVE = '1'
+_NEGATIVE = '0'
+
+
+class LocalTTLCache:
+    """Thread-safe in-process LRU cache with a TTL per entry"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (found, value); expired entries count as missing"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LookupCache:
+    """Two-level existence cache: a local LRU in front of a shared Redis cache.
+
+    Loaders return True or False for a definitive answer and None when the
+    answer should not be cached (for example a 5xx from the service).
+    Negative answers are cached with a shorter TTL. Local entries live at
+    most LOOKUP_CACHE_LOCAL_TTL seconds, which bounds how long another
+    process can serve an entry after invalidate().
+    """
+
+    def __init__(self, name, redis_getter, max_entries=None, ttl=None, negative_ttl=None, local_ttl=None):
+        self.name = name
+        self._redis_getter = redis_getter
+        self.ttl = ttl or settings.LOOKUP_CACHE_TTL
+        self.negative_ttl = negative_ttl or settings.LOOKUP_CACHE_NEGATIVE_TTL
+        self.local_ttl = local_ttl or settings.LOOKUP_CACHE_LOCAL_TTL
+        self.local = LocalTTLCache(max_entries or settings.LOOKUP_CACHE_MAX_ENTRIES)
+        self._stats_lock = threading.Lock()
+        self._counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'negative_hits': 0}
+
+    def _redis_key(self, key):
+        return f"lookup:{self.name}:{key}"
+
+    def _count(self, counter, negative=False):
+        with self._stats_lock:
+            self._counters[counter] += 1
+            if negative:
+                self._counters['negative_hits'] += 1
+
+    def _decode(self, raw):
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        return raw == _POSITIVE
+
+    def _store_local(self, key, exists):
+        ttl = self.local_ttl if exists else min(self.local_ttl, self.negative_ttl)
+        self.local.set(key, exists, ttl)
+
+    def _lookup_local(self, key):
+        found, exists = self.local.get(key)
+        if found:
+            self._count('local_hits', negative=not exists)
+        return found, exists
+
+    def _shared_ttl(self, exists):
+        return self.ttl if exists else self.negative_ttl
+
+    def get_or_load(self, key, loader):
+        """Return whether key exists, calling loader only on a miss at both levels"""
+        found, exists = self._lookup_local(key)
+        if found:
+            return exists
+
+        redis_client = self._redis_getter()
+        try:
+            exists = self._decode(redis_client.get(self._redis_key(key)))
+        except Exception as e:
+            logger.warning(f"Shared lookup cache unavailable for {self.name}: {e}")
+            exists = None
+        if exists is not None:
+            self._count('shared_hits', negative=not exists)
+            self._store_local(key, exists)
+            return exists
+
+        self._count('misses')
+        exists = loader()
+        if exists is None:
+            return False
+        self._store_local(key, exists)
+        try:
+            redis_client.setex(self._redis_key(key), self._shared_ttl(exists), _POSITIVE if exists else _NEGATIVE)
+        except Exception as e:
+            logger.warning(f"Could not populate shared lookup cache for {self.name}: {e}")
+        return exists
+
+    async def aget_or_load(self, key, loader, redis_client):
+        """Async variant of get_or_load; loader is a coroutine function"""
+        found, exists = self._lookup_local(key)
+        if found:
+            return exists
+
+        try:
+            exists = self._decode(await redis_client.get(self._redis_key(key)))
+        except Exception as e:
+            logger.warning(f"Shared lookup cache unavailable for {self.name}: {e}")
+            exists = None
+        if exists is not None:
+            self._count('shared_hits', negative=not exists)
+            self._store_local(key, exists)
+            return exists
+
+        self._count('misses')
+        exists = await loader()
+        if exists is None:
+            return False
+        self._store_local(key, exists)
+        try:
+            await redis_client.setex(self._redis_key(key), self._shared_ttl(exists), _POSITIVE if exists else _NEGATIVE)
+        except Exception as e:
+            logger.warning(f"Could not populate shared lookup cache for {self.name}: {e}")
+        return exists
+
+    def invalidate(self, key):
+        """Drop key from this process and from the shared cache"""
+        self.local.delete(key)
+        self._redis_getter().delete(self._redis_key(key))
+
+    def clear_local(self):
+        self.local.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._counters)
+        stats['evictions'] = self.local.evictions
+        stats['local_entries'] = len(self.local)
+        return stats
@@ -0,0 +1,53 @@
+import time
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api_gateway import views
+from api_gateway.rabbitmq import CONNECTION_ERRORS, get_rabbitmq_connection
+from api_gateway.status_ingestion import StatusIngester
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Apply delivery results from the results queue to Redis and the Notification table in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.STATUS_INGEST_BATCH_SIZE)
+        parser.add_argument('--prefetch', type=int, default=settings.STATUS_INGEST_PREFETCH,
+                            help='Unacknowledged deliveries held per worker; keep it above the batch size')
+        parser.add_argument('--flush-interval', type=float, default=settings.STATUS_INGEST_FLUSH_INTERVAL,
+                            help='Seconds to wait for more results before flushing a partial batch')
+        parser.add_argument('--once', action='store_true', help='Drain the results queue and exit')
+
+    def handle(self, *args, **options):
+        ingester = StatusIngester(
+            views.redis_client,
+            batch_size=options['batch_size'],
+            flush_interval=options['flush_interval'],
+            prefetch=options['prefetch']
+        )
+        logger.info(f"Status ingester started with batch size {ingester.batch_size}, prefetch {ingester.prefetch}")
+
+        while True:
+            connection = None
+            try:
+                connection = get_rabbitmq_connection()
+                ingested = ingester.run(connection.channel(), until_idle=options['once'])
+                if options['once']:
+                    self.stdout.write(f"Ingested {ingested} status results")
+                    return
+            except CONNECTION_ERRORS as e:
+                logger.error(f"Status ingester lost its RabbitMQ connection: {e}")
+                if options['once']:
+                    raise
+            except Exception as e:
+                logger.error(f"Status ingester error: {e}")
+                if options['once']:
+                    raise
+            finally:
+                if connection is not None and connection.is_open:
+                    connection.close()
+            time.sleep(settings.RABBITMQ_RECONNECT_DELAY)
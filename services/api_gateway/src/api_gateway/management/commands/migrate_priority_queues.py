@@ -0,0 +1,59 @@
+import logging
+
+import pika
+from django.core.management.base import BaseCommand
+
+from api_gateway.rabbitmq import WORK_QUEUES, get_rabbitmq_connection, move_legacy_messages, setup_queues
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Move work from the legacy email/push queues to the priority queues'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true',
+                            help='Delete each legacy queue once it is empty and has no consumers')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the messages left in the legacy queues')
+
+    def _legacy_queue(self, connection, routing_key):
+        """Return (channel, message count, consumer count), or None when the queue is gone"""
+        channel = connection.channel()
+        try:
+            declared = channel.queue_declare(queue=routing_key, passive=True)
+        except pika.exceptions.ChannelClosedByBroker:
+            return None  # a failed passive declare closes the channel
+        return channel, declared.method.message_count, declared.method.consumer_count
+
+    def handle(self, *args, **options):
+        connection = get_rabbitmq_connection()
+        try:
+            if not options['dry_run']:
+                setup_queues(connection.channel())
+
+            for routing_key in WORK_QUEUES:
+                legacy = self._legacy_queue(connection, routing_key)
+                if legacy is None:
+                    self.stdout.write(f"{routing_key}: already migrated")
+                    continue
+                channel, messages, consumers = legacy
+                if options['dry_run']:
+                    self.stdout.write(f"{routing_key}: {messages} messages, {consumers} consumers")
+                    continue
+
+                # From here on every new message routes to the priority queue only
+                channel.queue_unbind(queue=routing_key, exchange='notifications.direct', routing_key=routing_key)
+                channel.confirm_delivery()
+                moved = move_legacy_messages(channel, routing_key)
+                self.stdout.write(f"{routing_key}: moved {moved} messages to {WORK_QUEUES[routing_key]}")
+
+                if options['delete']:
+                    # if_empty/if_unused keep a queue that an old consumer still holds
+                    try:
+                        channel.queue_delete(queue=routing_key, if_empty=True, if_unused=True)
+                        self.stdout.write(f"{routing_key}: deleted")
+                    except pika.exceptions.ChannelClosedByBroker as e:
+                        self.stdout.write(f"{routing_key}: kept ({e.reply_text})")
+        finally:
+            connection.close()
@@ -0,0 +1,57 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api_gateway.partitions import (
+    TABLE,
+    archive_path,
+    ensure_partitions,
+    existing_months,
+    expired_months,
+    retention_cutoff,
+    retire_partition,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Create upcoming Notification partitions, and archive, detach and drop month partitions '
+            'past the retention window')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=settings.NOTIFICATION_PARTITIONS_AHEAD,
+                            help='Number of future months to keep partitions ready for')
+        parser.add_argument('--archive-dir', default=settings.NOTIFICATION_ARCHIVE_DIR,
+                            help='COPY each expired month to <dir>/<partition>.csv.gz before dropping it')
+        parser.add_argument('--no-archive', action='store_true', help='Drop expired months without archiving')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be dropped')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Notification partitions require PostgreSQL')
+        archive_dir = None if options['no_archive'] else options['archive_dir']
+        if not archive_dir and not options['no_archive']:
+            raise CommandError('Set --archive-dir (or NOTIFICATION_ARCHIVE_DIR) or pass --no-archive')
+
+        now = timezone.now()
+        cutoff = retention_cutoff(now, settings.NOTIFICATION_RETENTION_DAYS)
+        with connection.cursor() as cursor:
+            expired = expired_months(existing_months(cursor), cutoff)
+            if options['dry_run']:
+                for name in expired:
+                    self.stdout.write(f"Would archive and drop {name}")
+                return
+
+            created = ensure_partitions(cursor, now, options['months_ahead'])
+            self.stdout.write(f"Partitions ready through {created[-1]}")
+
+            for name in expired:
+                path = archive_path(archive_dir, name) if archive_dir else None
+                with transaction.atomic():
+                    retire_partition(cursor, TABLE, name, path)
+                logger.info(f"Dropped expired notification partition {name}")
+                self.stdout.write(f"Dropped {name}" + (f", archived to {path}" if path else ""))
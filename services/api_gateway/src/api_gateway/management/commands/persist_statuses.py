@@ -0,0 +1,54 @@
+import time
+import socket
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api_gateway import views
+from api_gateway.status_persistence import ensure_consumer_group, persist_pending
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Persist status changes from the Redis status log to the Notification table in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.STATUS_PERSIST_BATCH_SIZE)
+        parser.add_argument('--flush-interval', type=float, default=settings.STATUS_PERSIST_FLUSH_INTERVAL,
+                            help='Seconds to wait for new status changes before flushing a partial batch')
+        parser.add_argument('--consumer', default=socket.gethostname(),
+                            help='Consumer name within the persister consumer group; keep it stable '
+                                 'across restarts so unacknowledged changes are retried')
+        parser.add_argument('--once', action='store_true', help='Persist a single batch and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        block_ms = int(options['flush_interval'] * 1000)
+        ensure_consumer_group(views.redis_client)
+        logger.info(f"Status persister {options['consumer']} started with batch size {batch_size}")
+
+        # Retry unacknowledged changes first, then read new ones; a failed
+        # batch stays pending and is retried after a growing delay
+        recover = True
+        delay = settings.STATUS_PERSIST_RETRY_DELAY
+        while True:
+            try:
+                persisted = persist_pending(views.redis_client, options['consumer'], batch_size, block_ms, recover)
+            except Exception as e:
+                logger.error(f"Status persister error, retrying in {delay}s: {e}")
+                if options['once']:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, settings.STATUS_PERSIST_MAX_RETRY_DELAY)
+                recover = True
+                continue
+            delay = settings.STATUS_PERSIST_RETRY_DELAY
+
+            if recover and not persisted:
+                recover = False
+                continue
+            if options['once']:
+                self.stdout.write(f"Persisted {persisted} status changes")
+                return
@@ -0,0 +1,37 @@
+import time
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api_gateway.outbox import relay_pending
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Publish pending outbox notifications to RabbitMQ in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_RELAY_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=settings.OUTBOX_RELAY_POLL_INTERVAL,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Relay a single batch and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        logger.info(f"Outbox relay started with batch size {batch_size}")
+
+        while True:
+            try:
+                published = relay_pending(batch_size)
+            except Exception as e:
+                logger.error(f"Outbox relay error: {e}")
+                published = 0
+
+            if options['once']:
+                self.stdout.write(f"Published {published} notifications")
+                return
+            # Keep draining while full batches come back
+            if published < batch_size:
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,63 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api_gateway.dead_letters import replay_dead_letters
+from api_gateway.rabbitmq import get_confirming_publisher, get_rabbitmq_connection
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Group dead-lettered messages in failed.queue by failure reason and replay selected groups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', action='append', dest='groups', default=[],
+                            help='Group to replay, as reason:queue (e.g. rejected:email.priority.queue); repeatable')
+        parser.add_argument('--all', action='store_true', help='Replay every group')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the groups; the default when no group is selected')
+        parser.add_argument('--limit', type=int, help='Examine at most this many messages')
+        parser.add_argument('--batch-size', type=int, default=settings.DLQ_REPLAY_BATCH_SIZE)
+        parser.add_argument('--rate', type=float, default=settings.DLQ_REPLAY_RATE,
+                            help='Replayed messages per second; 0 for no limit')
+        parser.add_argument('--concurrency', type=int, default=settings.DLQ_REPLAY_CONCURRENCY,
+                            help='Replayed messages awaiting their broker confirm at once')
+
+    def _report(self, summary):
+        for key, stats in sorted(summary.items()):
+            self.stdout.write(
+                f"  {key}: {stats['messages']} messages, {stats['replayed']} replayed, {stats['failed']} failed"
+            )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run'] or not (options['groups'] or options['all'])
+        groups = None if options['all'] else set(options['groups'])
+
+        seen = 0
+
+        def progress(summary):
+            nonlocal seen
+            seen = sum(stats['messages'] for stats in summary.values())
+            replayed = sum(stats['replayed'] for stats in summary.values())
+            self.stdout.write(f"Examined {seen} messages, replayed {replayed}")
+
+        connection = get_rabbitmq_connection()
+        try:
+            summary = replay_dead_letters(
+                connection.channel(),
+                None if dry_run else get_confirming_publisher(),
+                groups=groups,
+                dry_run=dry_run,
+                limit=options['limit'],
+                batch_size=options['batch_size'],
+                rate=options['rate'],
+                concurrency=options['concurrency'],
+                progress=progress
+            )
+        finally:
+            connection.close()
+
+        self.stdout.write(f"{'Dry run: ' if dry_run else ''}{seen} dead letters in {len(summary)} groups")
+        self._report(summary)
@@ -1,15 +1,39 @@
 import uuid
 import logging
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
 
 class CorrelationIdMiddleware:
     """Middleware to add correlation ID to requests for tracing"""
 
+    # Async-capable so the ASGI stack stays fully asynchronous
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
         self.logger = logging.getLogger(__name__)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        extra = self.process_request(request)
+
+        # Process the request
+        response = self.get_response(request)
+
+        return self.process_response(response, extra)
+
+    async def __acall__(self, request):
+        extra = self.process_request(request)
+        response = await self.get_response(request)
+        return self.process_response(response, extra)
+
+    def process_request(self, request):
         # Generate or get correlation ID
         correlation_id = request.META.get('HTTP_X_CORRELATION_ID') or str(uuid.uuid4())
 
@@ -19,12 +43,11 @@ class CorrelationIdMiddleware:
         # Add to logging context
         extra = {'correlation_id': correlation_id}
         self.logger.info(f"Request started: {request.method} {request.path}", extra=extra)
+        return extra
 
-        # Process the request
-        response = self.get_response(request)
-
+    def process_response(self, response, extra):
         # Add correlation ID to response headers
-        response['X-Correlation-ID'] = correlation_id
+        response['X-Correlation-ID'] = extra['correlation_id']
 
         self.logger.info(f"Request completed: {response.status_code}", extra=extra)
 
@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-17 03:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_id', models.CharField(db_index=True, max_length=255, unique=True)),
+                ('status', models.CharField(choices=[('delivered', 'delivered'), ('pending', 'pending'), ('failed', 'failed')], default='pending', max_length=20)),
+                ('user_id', models.CharField(db_index=True, max_length=255)),
+                ('notification_type', models.CharField(max_length=50)),
+                ('template_code', models.CharField(max_length=255)),
+                ('variables', models.JSONField(default=dict)),
+                ('priority', models.IntegerField(default=1)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['status', 'created_at'], name='api_gateway_status_032108_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user_id', 'status'], name='api_gateway_user_id_fe19cd_idx'),
+        ),
+    ]
@@ -0,0 +1,132 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Self-contained on purpose: this migration must keep producing the same
+# schema whatever later happens to api_gateway.partitions
+TABLE = 'api_gateway_notification'
+MONTHS_AHEAD = 3
+
+COLUMNS = (
+    'id, notification_id, status, user_id, notification_type, template_code, variables, '
+    'priority, metadata, error_message, published_at, created_at, updated_at'
+)
+
+
+def next_month(start):
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def create_month_partitions(cursor, since, now):
+    """Create month partitions from since's month through MONTHS_AHEAD months after now"""
+    start = datetime(since.year, since.month, 1, tzinfo=dt_timezone.utc)
+    end = datetime(now.year, now.month, 1, tzinfo=dt_timezone.utc)
+    for _ in range(MONTHS_AHEAD):
+        end = next_month(end)
+    while start <= end:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE}_p{start:%Y%m} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_month(start).isoformat()}')"
+        )
+        start = next_month(start)
+
+
+def partition_notification_table(apps, schema_editor):
+    """Rebuild the Notification table as a partitioned table (PostgreSQL only).
+
+    Unique constraints on a partitioned table must contain the partition
+    key, so the primary key becomes (id, created_at) and notification_id
+    keeps a plain index; its uniqueness moves to NotificationKey. Other
+    databases keep the plain table and only drop the unique constraint.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        Notification = apps.get_model('api_gateway', 'Notification')
+        old_field = Notification._meta.get_field('notification_id')
+        new_field = models.CharField(max_length=255, db_index=True)
+        new_field.set_attributes_from_name('notification_id')
+        schema_editor.alter_field(Notification, old_field, new_field)
+        return
+
+    old_table = f"{TABLE}_unpartitioned"
+    sequence = f"{TABLE}_partitioned_id_seq"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {old_table}")
+        cursor.execute(f"CREATE SEQUENCE {sequence}")
+        cursor.execute(f"""
+            CREATE TABLE {TABLE} (
+                id bigint NOT NULL DEFAULT nextval('{sequence}'),
+                notification_id varchar(255) NOT NULL,
+                status varchar(20) NOT NULL,
+                user_id varchar(255) NOT NULL,
+                notification_type varchar(50) NOT NULL,
+                template_code varchar(255) NOT NULL,
+                variables jsonb NOT NULL,
+                priority integer NOT NULL,
+                metadata jsonb NOT NULL,
+                error_message text NULL,
+                published_at timestamp with time zone NULL,
+                created_at timestamp with time zone NOT NULL,
+                updated_at timestamp with time zone NOT NULL,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """)
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id")
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+        cursor.execute(f"SELECT min(created_at) FROM {old_table}")
+        now = timezone.now()
+        create_month_partitions(cursor, cursor.fetchone()[0] or now, now)
+
+        cursor.execute(f"INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {old_table}")
+        cursor.execute(f"SELECT setval('{sequence}', COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false)")
+        cursor.execute(f"DROP TABLE {old_table}")
+
+        # Same index names as the model's Meta.indexes
+        cursor.execute(f"CREATE INDEX {TABLE}_notification_id_idx ON {TABLE} (notification_id)")
+        cursor.execute(f"CREATE INDEX {TABLE}_user_id_idx ON {TABLE} (user_id)")
+        cursor.execute(f"CREATE INDEX api_gateway_status_032108_idx ON {TABLE} (status, created_at)")
+        cursor.execute(f"CREATE INDEX api_gateway_user_id_fe19cd_idx ON {TABLE} (user_id, status)")
+        cursor.execute(
+            f"CREATE INDEX notification_outbox_idx ON {TABLE} (created_at) WHERE published_at IS NULL"
+        )
+
+
+def create_notification_keys(apps, schema_editor):
+    Notification = apps.get_model('api_gateway', 'Notification')
+    NotificationKey = apps.get_model('api_gateway', 'NotificationKey')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {NotificationKey._meta.db_table} (notification_id, created_at) "
+            f"SELECT notification_id, min(created_at) FROM {Notification._meta.db_table} GROUP BY notification_id"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_gateway', '0002_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationKey',
+            fields=[
+                ('notification_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_notification_keys, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='notification',
+                    name='notification_id',
+                    field=models.CharField(db_index=True, max_length=255),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(partition_notification_table, migrations.RunPython.noop, elidable=False),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_gateway', '0003_partition_notification'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='api_gateway_status_032108_idx',
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user_id', 'created_at', 'id'], name='notification_user_hist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='notification_status_hist_idx'),
+        ),
+    ]
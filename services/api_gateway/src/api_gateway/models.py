@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import connection, models, transaction
 from django.utils import timezone
 from enum import Enum
 from dataclasses import dataclass
@@ -22,7 +22,9 @@ class NotificationStatusData:
 
 class Notification(models.Model):
     """Persistent storage for notification status tracking"""
-    notification_id = models.CharField(max_length=255, unique=True, db_index=True)
+    # Unique through NotificationKey: the partitioned table can only enforce
+    # unique constraints that include the partition key
+    notification_id = models.CharField(max_length=255, db_index=True)
     status = models.CharField(
         max_length=20,
         choices=[(status.value, status.value) for status in NotificationStatus],
@@ -35,19 +37,48 @@ class Notification(models.Model):
     priority = models.IntegerField(default=1)
     metadata = models.JSONField(default=dict, blank=True)
     error_message = models.TextField(blank=True, null=True)
+    # Set by the outbox relay once the message has been handed to RabbitMQ
+    published_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['status', 'created_at']),
             models.Index(fields=['user_id', 'status']),
+            # Match the history keyset order (created_at, id) under each filter
+            models.Index(fields=['user_id', 'created_at', 'id'], name='notification_user_hist_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='notification_status_hist_idx'),
+            models.Index(
+                fields=['created_at'],
+                name='notification_outbox_idx',
+                condition=models.Q(published_at__isnull=True),
+            ),
         ]
 
     def __str__(self):
         return f"{self.notification_id} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding or kwargs.get('force_update'):
+            return super().save(*args, **kwargs)
+        # Raises IntegrityError, and inserts nothing, for a taken notification_id
+        with transaction.atomic():
+            NotificationKey.objects.create(notification_id=self.notification_id, created_at=self.created_at)
+            super().save(*args, **kwargs)
+
+    def to_message(self) -> dict:
+        """Build the queue message body published for this notification"""
+        return {
+            'request_id': self.notification_id,
+            'user_id': self.user_id,
+            'template_code': self.template_code,
+            'variables': self.variables,
+            'priority': self.priority,
+            'metadata': self.metadata,
+            'timestamp': self.created_at.timestamp()
+        }
+
     def to_dataclass(self) -> NotificationStatusData:
         """Convert model instance to dataclass for backward compatibility"""
         return NotificationStatusData(
@@ -56,3 +87,40 @@ class Notification(models.Model):
             timestamp=self.updated_at,
             error=self.error_message
         )
+
+
+class NotificationKey(models.Model):
+    """One row per notification_id, written in the same transaction as its Notification"""
+    notification_id = models.CharField(max_length=255, primary_key=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def claim(cls, keys):
+        """Insert {notification_id: created_at} keys; return the ids that were not already taken"""
+        claimed = set()
+        items = list(keys.items())
+        with connection.cursor() as cursor:
+            for start in range(0, len(items), 500):
+                chunk = items[start:start + 500]
+                cursor.execute(
+                    f"INSERT INTO {cls._meta.db_table} (notification_id, created_at) "
+                    f"VALUES {', '.join(['(%s, %s)'] * len(chunk))} "
+                    f"ON CONFLICT (notification_id) DO NOTHING RETURNING notification_id",
+                    [value for item in chunk for value in item]
+                )
+                claimed.update(row[0] for row in cursor.fetchall())
+        return claimed
+
+
+def bulk_create_unique(notifications, batch_size=None):
+    """bulk_create the rows whose notification_id is not taken yet; returns the created rows"""
+    first = {}
+    for notification in notifications:
+        first.setdefault(notification.notification_id, notification)
+    with transaction.atomic():
+        claimed = NotificationKey.claim({
+            notification_id: notification.created_at for notification_id, notification in first.items()
+        })
+        rows = [notification for notification_id, notification in first.items() if notification_id in claimed]
+        Notification.objects.bulk_create(rows, batch_size=batch_size)
+    return rows
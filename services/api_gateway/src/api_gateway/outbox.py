@@ -0,0 +1,105 @@
+import json
+import logging
+from concurrent.futures import wait as wait_futures
+
+import pika
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationStatus
+from .rabbitmq import amqp_priority, get_publisher_pool, get_confirming_publisher
+
+logger = logging.getLogger(__name__)
+
+
+def build_outbox_row(request_id, data):
+    """Build an unsaved pending Notification row for a validated payload"""
+    return Notification(
+        notification_id=request_id,
+        status=NotificationStatus.pending.value,
+        user_id=data.get('user_id'),
+        notification_type=data.get('notification_type'),
+        template_code=data.get('template_code'),
+        variables=data.get('variables', {}),
+        priority=data.get('priority', 1),
+        metadata=data.get('metadata', {}),
+    )
+
+
+def _properties(notification):
+    return pika.BasicProperties(
+        delivery_mode=2,  # persistent
+        message_id=notification.notification_id,
+        priority=amqp_priority(notification.priority)
+    )
+
+
+def _publish_confirmed(notifications):
+    """Publish through the confirming publisher; return the acked rows"""
+    publisher = get_confirming_publisher()
+    futures = [
+        publisher.publish(
+            exchange='notifications.direct',
+            routing_key=f'{notification.notification_type}.queue',
+            body=json.dumps(notification.to_message()),
+            properties=_properties(notification)
+        )
+        for notification in notifications
+    ]
+    wait_futures(futures, timeout=settings.RABBITMQ_CONFIRM_TIMEOUT)
+    return [
+        notification for notification, future in zip(notifications, futures)
+        if future.done() and future.exception() is None
+    ]
+
+
+def _publish_pooled(notifications):
+    """Publish on one pooled channel; return the rows handed to the broker"""
+    published = []
+    try:
+        with get_publisher_pool().channel() as channel:
+            for notification in notifications:
+                channel.basic_publish(
+                    exchange='notifications.direct',
+                    routing_key=f'{notification.notification_type}.queue',
+                    body=json.dumps(notification.to_message()),
+                    properties=_properties(notification)
+                )
+                published.append(notification)
+    except Exception as e:
+        logger.error(f"Outbox relay publish failed after {len(published)} messages: {e}")
+    return published
+
+
+def relay_pending(batch_size=None):
+    """Claim a batch of unpublished outbox rows, publish them and mark them sent.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    relays can run side by side without publishing the same row twice. Rows
+    the broker did not accept stay unpublished and are retried next round.
+    Returns the number of rows published.
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects
+            .select_for_update(skip_locked=True)
+            .filter(published_at__isnull=True, status=NotificationStatus.pending.value)
+            .order_by('created_at')[:batch_size]
+        )
+        if not notifications:
+            return 0
+
+        if settings.RABBITMQ_PUBLISHER_CONFIRMS:
+            published = _publish_confirmed(notifications)
+        else:
+            published = _publish_pooled(notifications)
+
+        Notification.objects.filter(
+            pk__in=[notification.pk for notification in published]
+        ).update(published_at=timezone.now())
+
+    if len(published) < len(notifications):
+        logger.warning(f"Outbox relay left {len(notifications) - len(published)} rows for retry")
+    return len(published)
@@ -0,0 +1,121 @@
+import os
+import re
+import gzip
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from .models import Notification, NotificationKey
+
+logger = logging.getLogger(__name__)
+
+# The Notification table is range partitioned by month on created_at, so
+# status changes update rows in place. Retention works on whole months: a
+# month that ended before the retention cutoff is copied to a .csv.gz
+# archive, then detached and dropped, so expired rows are never deleted
+# one by one. A default partition catches rows outside the months created
+# so far.
+TABLE = Notification._meta.db_table
+KEY_TABLE = NotificationKey._meta.db_table
+_MONTH_RE = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(start):
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def month_partition_name(start):
+    return f"{TABLE}_p{start:%Y%m}"
+
+
+def month_partition_sql(start):
+    """SQL creating one month partition"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {month_partition_name(start)} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_month(start).isoformat()}')"
+    )
+
+
+def _children(cursor, parent):
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "WHERE parent.relname = %s",
+        [parent]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def existing_months(cursor):
+    """Return {month start: month partition name} for the partitions that exist"""
+    months = {}
+    for name in _children(cursor, TABLE):
+        match = _MONTH_RE.match(name)
+        if match:
+            months[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+    return months
+
+
+def ensure_partitions(cursor, now, months_ahead, since=None):
+    """Create month partitions from since (default: this month) to months_ahead months after now"""
+    start = month_start(since or now)
+    end = month_start(now)
+    for _ in range(months_ahead):
+        end = next_month(end)
+    created = []
+    while start <= end:
+        cursor.execute(month_partition_sql(start))
+        created.append(month_partition_name(start))
+        start = next_month(start)
+    return created
+
+
+def retention_cutoff(now, retention_days):
+    """created_at before which rows have expired, or None when retention is disabled"""
+    return now - timedelta(days=retention_days) if retention_days > 0 else None
+
+
+def expired_months(months, cutoff):
+    """Pick the month partitions that end on or before cutoff.
+
+    months maps month start to partition name.
+    """
+    if cutoff is None:
+        return []
+    return sorted(name for start, name in months.items() if next_month(start) <= cutoff)
+
+
+def archive_path(archive_dir, name):
+    return os.path.join(archive_dir, f"{name}.csv.gz")
+
+
+def archive_partition(cursor, name, path):
+    """COPY a whole partition to a gzipped CSV file at path.
+
+    The file is written under a temporary name and moved into place once
+    complete, so path only ever holds a full archive.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.partial"
+    with gzip.open(partial, 'wb') as archive:
+        cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+    os.replace(partial, path)
+
+
+def retire_partition(cursor, parent, name, path=None):
+    """Archive a month partition to path (if given), then detach and drop it.
+
+    Run inside a transaction. The partition is locked against writes first,
+    so the archive holds exactly the rows that are dropped, and the rows'
+    NotificationKey entries are removed in the same transaction.
+    """
+    cursor.execute(f"LOCK TABLE {name} IN SHARE MODE")
+    if path is not None:
+        archive_partition(cursor, name, path)
+    cursor.execute(f"DELETE FROM {KEY_TABLE} USING {name} WHERE {KEY_TABLE}.notification_id = {name}.notification_id")
+    cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {name}")
+    cursor.execute(f"DROP TABLE {name}")
@@ -0,0 +1,495 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import pika
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Errors after which a pooled connection can no longer be trusted
+CONNECTION_ERRORS = (
+    pika.exceptions.AMQPConnectionError,
+    pika.exceptions.AMQPChannelError,
+)
+
+
+class PublisherPoolExhausted(Exception):
+    """Raised when no pooled channel becomes free within the acquire timeout"""
+
+
+class PublishNacked(Exception):
+    """Raised when the broker rejects a message or its confirm is lost"""
+
+
+def get_connection_parameters():
+    credentials = pika.PlainCredentials(
+        settings.RABBITMQ_USER,
+        settings.RABBITMQ_PASS
+    )
+    return pika.ConnectionParameters(
+        settings.RABBITMQ_HOST,
+        settings.RABBITMQ_PORT,
+        '/',
+        credentials,
+        heartbeat=settings.RABBITMQ_HEARTBEAT
+    )
+
+
+# RabbitMQ connection
+def get_rabbitmq_connection():
+    return pika.BlockingConnection(get_connection_parameters())
+
+
+# Work queues by routing key. Priority only applies to queues declared with
+# x-max-priority, and RabbitMQ refuses to redeclare an existing durable
+# queue with new arguments, so the priority queues are new queues bound to
+# the routing keys the legacy email.queue/push.queue used. The
+# migrate_priority_queues command unbinds and drains the legacy queues.
+WORK_QUEUES = {
+    'email.queue': 'email.priority.queue',
+    'push.queue': 'push.priority.queue',
+}
+
+
+def work_queue_arguments():
+    return {
+        'x-dead-letter-exchange': 'notifications.dlx',
+        'x-dead-letter-routing-key': 'failed',
+        'x-max-priority': settings.RABBITMQ_MAX_PRIORITY,
+    }
+
+
+def amqp_priority(priority):
+    """Map a request's priority to an AMQP message priority.
+
+    Higher is more urgent, as in AMQP; values are clamped to
+    0..RABBITMQ_MAX_PRIORITY and anything that is not an integer gets the
+    default priority of 1.
+    """
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        priority = 1
+    return max(0, min(priority, settings.RABBITMQ_MAX_PRIORITY))
+
+
+RETRY_COUNT_HEADER = 'x-retry-count'
+
+
+def retry_queue_name(routing_key, delay):
+    """Delay queue for one retry tier, e.g. email.retry.5000ms for email.queue.
+
+    The delay is part of the name because a queue's x-message-ttl cannot
+    change; new delays get new queues and the old ones drain on their own.
+    """
+    return f"{routing_key[:-len('.queue')] if routing_key.endswith('.queue') else routing_key}.retry.{delay}ms"
+
+
+def retry_queue_arguments(routing_key, delay):
+    # Every message in a tier has the same TTL, so they expire in order at
+    # the head of the queue and dead-letter back to the work exchange
+    return {
+        'x-message-ttl': delay,
+        'x-dead-letter-exchange': 'notifications.direct',
+        'x-dead-letter-routing-key': routing_key,
+    }
+
+
+# Setup RabbitMQ queues
+def setup_queues(channel):
+    # Declare exchange
+    channel.exchange_declare(exchange='notifications.direct', exchange_type='direct')
+
+    # Declare dead-letter exchange
+    channel.exchange_declare(exchange='notifications.dlx', exchange_type='direct')
+
+    # Declare failed queue (dead-letter queue)
+    channel.queue_declare(queue='failed.queue', durable=True)
+    channel.queue_bind(exchange='notifications.dlx', queue='failed.queue', routing_key='failed')
+
+    # Declare priority work queues with dead-letter
+    for routing_key, queue_name in WORK_QUEUES.items():
+        channel.queue_declare(queue=queue_name, durable=True, arguments=work_queue_arguments())
+        channel.queue_bind(exchange='notifications.direct', queue=queue_name, routing_key=routing_key)
+
+        # Retry delay tiers, published to through the default exchange
+        for delay in settings.RABBITMQ_RETRY_DELAYS:
+            channel.queue_declare(queue=retry_queue_name(routing_key, delay), durable=True,
+                                  arguments=retry_queue_arguments(routing_key, delay))
+
+
+def move_legacy_messages(channel, routing_key, limit=None):
+    """Republish messages left in a legacy work queue with their priority.
+
+    The legacy queue is named after its routing key. Each message is acked
+    only after the broker confirmed its copy (the channel must be in confirm
+    mode), so a crash can duplicate a message but never lose one. Returns
+    the number of messages moved.
+    """
+    moved = 0
+    while limit is None or moved < limit:
+        method, properties, body = channel.basic_get(queue=routing_key)
+        if method is None:
+            break
+        try:
+            priority = json.loads(body).get('priority')
+        except (ValueError, AttributeError):
+            priority = None
+        properties.priority = amqp_priority(priority)
+        channel.basic_publish(
+            exchange='notifications.direct',
+            routing_key=routing_key,
+            body=body,
+            properties=properties
+        )
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        moved += 1
+    return moved
+
+
+class _PooledChannel:
+    """A single long-lived connection/channel pair owned by the pool"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.connection = None
+        self.channel = None
+
+    def is_open(self):
+        return (
+            self.connection is not None
+            and self.channel is not None
+            and self.connection.is_open
+            and self.channel.is_open
+        )
+
+    def get_channel(self):
+        if self.is_open():
+            # Idle blocking connections only service heartbeats when asked to
+            self.connection.process_data_events(time_limit=0)
+            return self.channel
+
+        self.reset()
+        self.connection = self.pool.connection_factory()
+        self.channel = self.connection.channel()
+        self.pool.ensure_topology(self.channel)
+        return self.channel
+
+    def reset(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+        self.channel = None
+
+
+class PublisherPool:
+    """Per-process pool of long-lived RabbitMQ connections and channels.
+
+    Each slot owns one BlockingConnection and one channel; pika connections
+    are not thread-safe, so a slot is only ever used by one thread at a time.
+    Topology is declared on the first connection and again only after a
+    connection failure, so a publish is a single basic_publish.
+    """
+
+    def __init__(self, size=None, connection_factory=None, acquire_timeout=None):
+        self.size = size or settings.RABBITMQ_PUBLISHER_POOL_SIZE
+        self.acquire_timeout = (
+            acquire_timeout if acquire_timeout is not None
+            else settings.RABBITMQ_PUBLISHER_ACQUIRE_TIMEOUT
+        )
+        self.connection_factory = connection_factory or get_rabbitmq_connection
+        self._slots = queue.LifoQueue(maxsize=self.size)
+        for _ in range(self.size):
+            self._slots.put(_PooledChannel(self))
+        self._topology_lock = threading.Lock()
+        self._topology_declared = False
+
+    def ensure_topology(self, channel):
+        """Declare exchanges and queues once per process"""
+        if self._topology_declared:
+            return
+        with self._topology_lock:
+            if not self._topology_declared:
+                setup_queues(channel)
+                self._topology_declared = True
+
+    @contextmanager
+    def channel(self):
+        """Borrow a warm channel, reconnecting it if it was closed"""
+        try:
+            slot = self._slots.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise PublisherPoolExhausted(
+                f"No RabbitMQ channel available after {self.acquire_timeout}s"
+            )
+        try:
+            yield slot.get_channel()
+        except CONNECTION_ERRORS:
+            # The broker may have restarted and lost transient exchanges
+            slot.reset()
+            self._topology_declared = False
+            raise
+        finally:
+            self._slots.put(slot)
+
+    def publish(self, exchange, routing_key, body, properties=None):
+        """Publish on a pooled channel, retrying once on a fresh connection"""
+        for attempt in range(2):
+            try:
+                with self.channel() as channel:
+                    channel.basic_publish(
+                        exchange=exchange,
+                        routing_key=routing_key,
+                        body=body,
+                        properties=properties
+                    )
+                return
+            except CONNECTION_ERRORS as e:
+                if attempt:
+                    raise
+                logger.warning(f"RabbitMQ publish failed, reconnecting: {e}")
+
+    def close(self):
+        """Close every pooled connection"""
+        for _ in range(self.size):
+            slot = self._slots.get()
+            slot.reset()
+            self._slots.put(slot)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_publisher_pool():
+    """Return the publisher pool for the current process.
+
+    The pool is created lazily and recreated after a fork, so pre-forking
+    servers never share sockets between workers.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = PublisherPool()
+                _pool_pid = pid
+    return _pool
+
+
+class _PendingMessage:
+    __slots__ = ('exchange', 'routing_key', 'body', 'properties', 'future', 'on_nack')
+
+    def __init__(self, exchange, routing_key, body, properties, on_nack):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties
+        self.future = Future()
+        self.on_nack = on_nack
+
+
+class ConfirmingPublisher:
+    """Background publisher that micro-batches messages under publisher confirms.
+
+    Request threads hand messages over with publish() and get a Future back.
+    A single IO thread owns a SelectConnection in confirm mode; it publishes
+    buffered messages once batch_size is reached or linger seconds after the
+    first one arrived, and resolves each Future when the broker acks it. On
+    a nack, or when the connection drops before a confirm arrives, the Future
+    fails and the message's on_nack callback is invoked from the IO thread.
+    """
+
+    def __init__(self, batch_size=None, linger=None, reconnect_delay=None, connection_parameters=None):
+        self.batch_size = batch_size or settings.RABBITMQ_CONFIRM_BATCH_SIZE
+        self.linger = linger if linger is not None else settings.RABBITMQ_CONFIRM_LINGER
+        self.reconnect_delay = (
+            reconnect_delay if reconnect_delay is not None
+            else settings.RABBITMQ_RECONNECT_DELAY
+        )
+        self.connection_parameters = connection_parameters
+        self._lock = threading.Lock()
+        self._buffer = deque()
+        self._flush_scheduled = False
+        self._flush_timer = None
+        self._unconfirmed = {}
+        self._delivery_tag = 0
+        self._connection = None
+        self._channel = None
+        self._ready = False
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='rabbitmq-confirming-publisher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping = True
+        connection = self._connection
+        if connection is not None:
+            connection.ioloop.add_callback_threadsafe(self._close)
+
+    def publish(self, exchange, routing_key, body, properties=None, on_nack=None):
+        """Queue a message for the next batch and return a Future for its confirm"""
+        message = _PendingMessage(exchange, routing_key, body, properties, on_nack)
+        with self._lock:
+            self._buffer.append(message)
+            wake = not self._flush_scheduled or len(self._buffer) >= self.batch_size
+            self._flush_scheduled = True
+        connection = self._connection
+        if wake and self._ready and connection is not None:
+            try:
+                connection.ioloop.add_callback_threadsafe(self._schedule_flush)
+            except Exception:
+                # Connection is going away; the buffer is flushed on reconnect
+                pass
+        return message.future
+
+    # Everything below runs on the IO thread
+
+    def _run(self):
+        while not self._stopping:
+            self._connection = pika.SelectConnection(
+                self.connection_parameters or get_connection_parameters(),
+                on_open_callback=self._on_connection_open,
+                on_open_error_callback=self._on_connection_open_error,
+                on_close_callback=self._on_connection_closed
+            )
+            self._connection.ioloop.start()
+            if not self._stopping:
+                time.sleep(self.reconnect_delay)
+
+    def _close(self):
+        if self._connection is not None and not self._connection.is_closed:
+            self._connection.close()
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_open_error(self, connection, error):
+        logger.warning(f"Confirming publisher could not connect: {error}")
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        self._ready = False
+        self._channel = None
+        self._flush_timer = None
+        self._fail_unconfirmed(f"Connection closed before confirm: {reason}")
+        if not self._stopping:
+            logger.warning(f"Confirming publisher connection closed, reconnecting: {reason}")
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        self._channel = channel
+        channel.add_on_close_callback(self._on_channel_closed)
+        setup_queues(channel)
+        channel.confirm_delivery(
+            ack_nack_callback=self._on_delivery_confirmation,
+            callback=self._on_confirm_selected
+        )
+
+    def _on_channel_closed(self, channel, reason):
+        logger.warning(f"Confirming publisher channel closed: {reason}")
+        self._close()
+
+    def _on_confirm_selected(self, frame):
+        self._delivery_tag = 0
+        self._ready = True
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if len(self._buffer) >= self.batch_size:
+            if self._flush_timer is not None:
+                self._connection.ioloop.remove_timeout(self._flush_timer)
+                self._flush_timer = None
+            self._flush()
+        elif self._buffer and self._flush_timer is None:
+            self._flush_timer = self._connection.ioloop.call_later(self.linger, self._flush)
+
+    def _flush(self):
+        self._flush_timer = None
+        if not self._ready:
+            return
+        with self._lock:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            remaining = len(self._buffer)
+            if not remaining:
+                self._flush_scheduled = False
+
+        for index, message in enumerate(batch):
+            try:
+                self._channel.basic_publish(
+                    exchange=message.exchange,
+                    routing_key=message.routing_key,
+                    body=message.body,
+                    properties=message.properties
+                )
+            except Exception as e:
+                logger.warning(f"Confirming publisher failed mid-batch, requeueing: {e}")
+                with self._lock:
+                    self._buffer.extendleft(reversed(batch[index:]))
+                    self._flush_scheduled = True
+                return
+            self._delivery_tag += 1
+            self._unconfirmed[self._delivery_tag] = message
+
+        if remaining:
+            self._schedule_flush()
+
+    def _on_delivery_confirmation(self, method_frame):
+        method = method_frame.method
+        if method.multiple:
+            tags = [tag for tag in self._unconfirmed if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag]
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        for tag in tags:
+            message = self._unconfirmed.pop(tag, None)
+            if message is None or message.future.cancelled():
+                continue
+            if acked:
+                message.future.set_result(True)
+            else:
+                self._reject(message, 'Message rejected by broker')
+
+    def _fail_unconfirmed(self, reason):
+        unconfirmed, self._unconfirmed = self._unconfirmed, {}
+        for message in unconfirmed.values():
+            self._reject(message, reason)
+
+    def _reject(self, message, reason):
+        if message.on_nack is not None:
+            try:
+                message.on_nack(reason)
+            except Exception as e:
+                logger.error(f"on_nack callback failed: {e}")
+        if not message.future.cancelled():
+            message.future.set_exception(PublishNacked(reason))
+
+
+_confirming_publisher = None
+_confirming_publisher_pid = None
+
+
+def get_confirming_publisher():
+    """Return the started confirming publisher for the current process"""
+    global _confirming_publisher, _confirming_publisher_pid
+    pid = os.getpid()
+    if _confirming_publisher is None or _confirming_publisher_pid != pid:
+        with _pool_lock:
+            if _confirming_publisher is None or _confirming_publisher_pid != pid:
+                _confirming_publisher = ConfirmingPublisher()
+                _confirming_publisher.start()
+                _confirming_publisher_pid = pid
+    return _confirming_publisher
@@ -0,0 +1,131 @@
+import json
+import time
+import logging
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from .models import NotificationStatus
+from .status_persistence import persist_status_changes
+from .status_store import write_status
+
+logger = logging.getLogger(__name__)
+
+# The consumer services publish one result message per delivery attempt,
+# {"request_id", "status", "error", "timestamp"}, on this routing key. Any
+# number of ingesters consume the durable results queue as competing
+# consumers.
+RESULTS_ROUTING_KEY = 'status.results'
+RESULTS_QUEUE = 'status.results.queue'
+RESULT_STATUSES = {NotificationStatus.delivered.value, NotificationStatus.failed.value}
+
+
+def setup_results_queue(channel):
+    channel.exchange_declare(exchange='notifications.direct', exchange_type='direct')
+    channel.queue_declare(queue=RESULTS_QUEUE, durable=True)
+    channel.queue_bind(exchange='notifications.direct', queue=RESULTS_QUEUE, routing_key=RESULTS_ROUTING_KEY)
+
+
+def parse_result(body):
+    """Return (request_id, status, error, epoch) for a result message, or None if it is malformed"""
+    try:
+        result = json.loads(body)
+        request_id = result['request_id']
+        notification_status = result['status']
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Skipping malformed status result: {e}")
+        return None
+    if not isinstance(request_id, str) or not request_id or notification_status not in RESULT_STATUSES:
+        logger.warning(f"Skipping status result with invalid fields: {result!r}")
+        return None
+    timestamp = parse_datetime(result['timestamp']) if isinstance(result.get('timestamp'), str) else None
+    return request_id, notification_status, result.get('error'), timestamp.timestamp() if timestamp else None
+
+
+class StatusIngester:
+    """Apply delivery results to Redis and the Notification table in batches.
+
+    Deliveries are buffered until batch_size have arrived or flush_interval
+    has passed since the first one. A flush writes the Notification rows
+    with one bulk update and the status keys with one pipeline, then acks
+    the whole batch with a single multiple-ack. The channel's prefetch
+    should exceed batch_size so the next batch streams in during a flush.
+    """
+
+    def __init__(self, redis_client, batch_size=None, flush_interval=None, prefetch=None):
+        self.redis_client = redis_client
+        self.batch_size = batch_size or settings.STATUS_INGEST_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.STATUS_INGEST_FLUSH_INTERVAL
+        self.prefetch = prefetch or settings.STATUS_INGEST_PREFETCH
+        self._pending = []  # (delivery_tag, parsed result or None)
+        self._first_at = None
+
+    def add(self, delivery_tag, body):
+        if not self._pending:
+            self._first_at = time.monotonic()
+        self._pending.append((delivery_tag, parse_result(body)))
+
+    def due(self):
+        return bool(self._pending) and (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._first_at >= self.flush_interval
+        )
+
+    def apply(self, results):
+        """Write a batch of parsed results; returns the number of notifications changed"""
+        latest = {}
+        for request_id, notification_status, error, epoch in results:
+            latest[request_id] = (notification_status, error, epoch)
+        if not latest:
+            return 0
+
+        # Rows not yet created by the status persister get the change through
+        # the status log instead, after the reservation that creates them
+        skipped = []
+        persist_status_changes({
+            request_id: {'status': notification_status, 'error': error, 'record': None}
+            for request_id, (notification_status, error, _) in latest.items()
+        }, skipped=skipped)
+        skipped = set(skipped)
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for request_id, (notification_status, error, epoch) in latest.items():
+            write_status(pipe, request_id, notification_status, error, timestamp=epoch, log=request_id in skipped)
+        pipe.execute()
+        return len(latest)
+
+    def flush(self, channel):
+        """Apply the buffered results and ack them; nacked for redelivery on failure"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, []
+        last_tag = pending[-1][0]
+        try:
+            applied = self.apply([result for _, result in pending if result is not None])
+        except Exception:
+            channel.basic_nack(delivery_tag=last_tag, multiple=True, requeue=True)
+            raise
+        channel.basic_ack(delivery_tag=last_tag, multiple=True)
+        logger.info(f"Ingested {len(pending)} status results ({applied} notifications)")
+        return len(pending)
+
+    def run(self, channel, until_idle=False):
+        """Consume results until the channel closes, or with until_idle until the queue is drained.
+
+        Returns the number of result messages ingested.
+        """
+        setup_results_queue(channel)
+        channel.basic_qos(prefetch_count=self.prefetch)
+        ingested = 0
+        try:
+            for method, _, body in channel.consume(RESULTS_QUEUE, inactivity_timeout=self.flush_interval):
+                if method is not None:
+                    self.add(method.delivery_tag, body)
+                elif not self._pending and until_idle:
+                    break
+                if self.due() or (method is None and self._pending):
+                    ingested += self.flush(channel)
+        finally:
+            if channel.is_open:
+                channel.cancel()  # unacked deliveries go back to the queue
+        return ingested
@@ -0,0 +1,213 @@
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Notification, NotificationStatus, bulk_create_unique
+from .status_stream import TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Errors caused by the data of a change rather than by the database being
+# unavailable; a change failing with one of them is dead-lettered instead
+# of being retried forever
+POISON_ERRORS = (DataError, IntegrityError, ValueError, TypeError)
+
+
+def ensure_consumer_group(redis_client, stream=None, group=None):
+    """Create the persister consumer group (and the stream) if missing"""
+    try:
+        redis_client.xgroup_create(
+            stream or settings.NOTIFICATION_STATUS_LOG_STREAM,
+            group or settings.STATUS_PERSIST_GROUP,
+            id='0', mkstream=True
+        )
+    except redis.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def collapse_changes(entries, malformed=None):
+    """Reduce stream entries to the latest change per notification.
+
+    entries are (entry_id, fields) pairs in stream order. The notification
+    record from a reservation entry is kept even when later entries for the
+    same notification override its status, along with the reservation's
+    timestamp as the row's created_at. Each change lists the entries it
+    came from. Entries that cannot be parsed are skipped and appended to
+    malformed as (entry_id, fields, error) when given.
+    """
+    changes = {}
+    for entry_id, fields in entries:
+        try:
+            status_data = json.loads(fields['status'])
+            request_id = status_data['notification_id']
+            record = json.loads(fields['notification']) if fields.get('notification') else None
+            if record is not None and not isinstance(record, dict):
+                raise TypeError('notification record is not an object')
+        except (KeyError, TypeError, json.JSONDecodeError) as e:
+            logger.warning(f"Skipping malformed status log entry {entry_id}: {e}")
+            if malformed is not None:
+                malformed.append((entry_id, fields, str(e)))
+            continue
+        change = changes.setdefault(request_id, {'record': None, 'created_at': None, 'entries': []})
+        change['entries'].append((entry_id, fields))
+        change['status'] = status_data.get('status')
+        change['error'] = status_data.get('error')
+        if record is not None:
+            change['record'] = record
+            change['created_at'] = status_data.get('timestamp')
+    return changes
+
+
+def persist_status_changes(changes, skipped=None):
+    """Write collapsed status changes to Notification in bulk.
+
+    Existing rows get a bulk_update of their status; rows are created with
+    bulk_create only for changes that carry the notification record, since
+    updates from the consumer services only know the status. New rows keep
+    the change's created_at (the reservation time) when it has one. Request ids
+    with neither a row nor a record are appended to skipped when given. A
+    terminal status is never moved back to pending. Returns (created,
+    updated).
+    """
+    if not changes:
+        return 0, 0
+    now = timezone.now()
+    existing = {
+        notification.notification_id: notification
+        for notification in Notification.objects
+        .filter(notification_id__in=list(changes))
+        .only('id', 'notification_id', 'status', 'error_message', 'updated_at')
+    }
+
+    to_create = []
+    to_update = []
+    for request_id, change in changes.items():
+        notification = existing.get(request_id)
+        if notification is None:
+            if change['record'] is None:
+                logger.debug(f"No row and no record for status change of {request_id}")
+                if skipped is not None:
+                    skipped.append(request_id)
+                continue
+            record = change['record']
+            to_create.append(Notification(
+                notification_id=request_id,
+                status=change['status'],
+                error_message=change['error'],
+                user_id=record.get('user_id'),
+                notification_type=record.get('notification_type'),
+                template_code=record.get('template_code'),
+                variables=record.get('variables', {}),
+                priority=record.get('priority', 1),
+                metadata=record.get('metadata', {}),
+                created_at=parse_datetime(change['created_at']) if change.get('created_at') else now,
+            ))
+            continue
+        if notification.status in TERMINAL_STATUSES and change['status'] == NotificationStatus.pending.value:
+            continue
+        notification.status = change['status']
+        notification.error_message = change['error']
+        notification.updated_at = now  # bulk_update skips auto_now
+        to_update.append(notification)
+
+    batch_size = settings.STATUS_PERSIST_BATCH_SIZE
+    with transaction.atomic():
+        if to_create:
+            to_create = bulk_create_unique(to_create, batch_size=batch_size)
+        if to_update:
+            Notification.objects.bulk_update(
+                to_update, ['status', 'error_message', 'updated_at'], batch_size=batch_size
+            )
+    return len(to_create), len(to_update)
+
+
+def persist_isolating_failures(changes, failed):
+    """Persist changes in one batch, falling back to one notification at a time.
+
+    When the batch fails on bad data (see POISON_ERRORS), each notification
+    is retried on its own so one bad change cannot hold back the rest; the
+    entries of changes that still fail are appended to failed as
+    (entry_id, fields, error). Other errors propagate so the whole batch is
+    retried. Returns (created, updated).
+    """
+    try:
+        return persist_status_changes(changes)
+    except POISON_ERRORS as e:
+        logger.warning(f"Status batch failed, persisting it one notification at a time: {e}")
+
+    created = updated = 0
+    for request_id, change in changes.items():
+        try:
+            row_created, row_updated = persist_status_changes({request_id: change})
+        except POISON_ERRORS as e:
+            logger.error(f"Dead-lettering status changes of {request_id}: {e}")
+            failed.extend((entry_id, fields, str(e)) for entry_id, fields in change['entries'])
+            continue
+        created += row_created
+        updated += row_updated
+    return created, updated
+
+
+def dead_letter_entries(redis_client, entries):
+    """Copy status log entries that cannot be persisted to STATUS_PERSIST_DEAD_LETTER_STREAM"""
+    if not entries:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for entry_id, fields, error in entries:
+        pipe.xadd(settings.STATUS_PERSIST_DEAD_LETTER_STREAM, {**fields, 'entry_id': entry_id, 'error': error},
+                  maxlen=settings.NOTIFICATION_STATUS_LOG_MAXLEN, approximate=True)
+    pipe.execute()
+
+
+def claim_pending(redis_client, consumer, batch_size):
+    """Return pending entries to retry: this consumer's own first, then ones idle at other consumers.
+
+    Entries stay pending when a batch fails or a persister dies; other
+    consumers' entries are claimed once idle for STATUS_PERSIST_CLAIM_IDLE_MS
+    so those of replaced containers are not lost.
+    """
+    stream = settings.NOTIFICATION_STATUS_LOG_STREAM
+    group = settings.STATUS_PERSIST_GROUP
+    own = redis_client.xpending_range(stream, group, min='-', max='+', count=batch_size, consumername=consumer)
+    if own:
+        return redis_client.xclaim(stream, group, consumer, 0, [entry['message_id'] for entry in own])
+    claimed = redis_client.xautoclaim(
+        stream, group, consumer, settings.STATUS_PERSIST_CLAIM_IDLE_MS, '0-0', count=batch_size
+    )
+    return claimed[1] if claimed else []
+
+
+def persist_pending(redis_client, consumer, batch_size=None, block_ms=None, recover=False):
+    """Read one batch from the status log, persist it and acknowledge it.
+
+    Reads new entries, waiting up to block_ms for them. With recover=True it
+    instead retries unacknowledged entries (see claim_pending), for example
+    after a failed batch or a crash. Entries that cannot be persisted are
+    dead-lettered and acknowledged with the rest. Returns the number of
+    entries processed.
+    """
+    stream = settings.NOTIFICATION_STATUS_LOG_STREAM
+    group = settings.STATUS_PERSIST_GROUP
+    batch_size = batch_size or settings.STATUS_PERSIST_BATCH_SIZE
+
+    if recover:
+        entries = claim_pending(redis_client, consumer, batch_size)
+    else:
+        response = redis_client.xreadgroup(group, consumer, {stream: '>'}, count=batch_size, block=block_ms)
+        entries = response[0][1] if response else []
+    if not entries:
+        return 0
+
+    failed = []
+    changes = collapse_changes(entries, malformed=failed)
+    created, updated = persist_isolating_failures(changes, failed)
+    dead_letter_entries(redis_client, failed)
+    redis_client.xack(stream, group, *[entry_id for entry_id, _ in entries])
+    logger.info(f"Persisted {len(entries)} status changes ({created} created, {updated} updated)")
+    return len(entries)
@@ -0,0 +1,186 @@
+import json
+import time
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+
+from .models import NotificationStatus
+
+logger = logging.getLogger(__name__)
+
+# status:{request_id} is a small hash rather than a JSON document:
+#   s  status code (STATUS_CODES)
+#   t  epoch seconds of the last change
+#   e  error message, only when there is one
+#   k  reservation token, present while the request_id is reserved
+# Field names are one letter and the hash stays listpack encoded, so a
+# tracked notification costs a fraction of the JSON string plus the separate
+# idempotency:{request_id} key it replaces. Keys written in the old JSON
+# format are still read until they expire (one STATUS_TTL after rollout).
+STATUS_CODES = {
+    NotificationStatus.pending.value: '0',
+    NotificationStatus.delivered.value: '1',
+    NotificationStatus.failed.value: '2',
+}
+CODE_STATUSES = {code: notification_status for notification_status, code in STATUS_CODES.items()}
+
+# KEYS: status key, status log.
+# ARGV: status code, epoch, error, ttl, channel, log maxlen, status message,
+#       '1' to append to the status log
+WRITE_SCRIPT = """
+if redis.call('TYPE', KEYS[1])['ok'] == 'string' then
+    redis.call('DEL', KEYS[1])
+end
+redis.call('HSET', KEYS[1], 's', ARGV[1], 't', ARGV[2])
+if ARGV[3] ~= '' then
+    redis.call('HSET', KEYS[1], 'e', ARGV[3])
+else
+    redis.call('HDEL', KEYS[1], 'e')
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('PUBLISH', ARGV[5], ARGV[7])
+if ARGV[8] == '1' then
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[6], '*', 'status', ARGV[7])
+end
+return 1
+"""
+
+
+def status_key(request_id):
+    return f"status:{request_id}"
+
+
+def encode_status(notification_status, error=None, timestamp=None):
+    """Return (status code, epoch seconds, error) for a status hash"""
+    notification_status = getattr(notification_status, 'value', notification_status)
+    return STATUS_CODES[notification_status], int(timestamp or time.time()), error or ''
+
+
+def status_message(request_id, notification_status, error=None, timestamp=None):
+    """JSON status update published on the status channel and appended to the status log"""
+    code, epoch, error = encode_status(notification_status, error, timestamp)
+    return json.dumps(decode_status(request_id, {'s': code, 't': epoch, 'e': error}))
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def decode_status(request_id, value):
+    """Decode a stored status:{request_id} value for API responses.
+
+    value is the hash read from Redis, or a string for keys written in the
+    old JSON format.
+    """
+    if isinstance(value, dict):
+        fields = {_text(field): _text(field_value) for field, field_value in value.items()}
+        try:
+            timestamp = datetime.fromtimestamp(int(fields['t']), dt_timezone.utc).isoformat()
+        except (KeyError, ValueError):
+            timestamp = None
+        return {
+            'notification_id': request_id,
+            'status': CODE_STATUSES.get(fields.get('s'), fields.get('s')),
+            'timestamp': timestamp,
+            'error': fields.get('e') or None
+        }
+
+    try:
+        status_data = json.loads(value)
+        return {
+            'notification_id': status_data['notification_id'],
+            'status': status_data['status'],
+            'timestamp': status_data.get('timestamp'),
+            'error': status_data.get('error')
+        }
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        logger.error(f"Error parsing status data for {request_id}: {str(e)}")
+        # Fallback for old format or corrupted data
+        value = _text(value)
+        return {
+            'notification_id': request_id,
+            'status': value,  # Return raw value
+            'timestamp': time.time(),
+            'error': None
+        }
+
+
+def _pipeline_statuses(redis_client, request_ids):
+    pipe = redis_client.pipeline(transaction=False)
+    for request_id in request_ids:
+        pipe.hgetall(status_key(request_id))
+    return pipe
+
+
+def _legacy_positions(values):
+    # HGETALL on a key still holding the old JSON string fails with WRONGTYPE
+    return [
+        position for position, value in enumerate(values)
+        if isinstance(value, redis.ResponseError) and 'WRONGTYPE' in str(value)
+    ]
+
+
+def _finish(values):
+    for value in values:
+        if isinstance(value, Exception):
+            raise value
+    return [value or None for value in values]
+
+
+def read_status(redis_client, request_id):
+    """Read one stored status; see read_statuses"""
+    try:
+        return redis_client.hgetall(status_key(request_id)) or None
+    except redis.ResponseError as e:
+        if 'WRONGTYPE' not in str(e):
+            raise
+        return redis_client.get(status_key(request_id))
+
+
+def read_statuses(redis_client, request_ids):
+    """Read the stored status of each request_id in one pipelined round trip.
+
+    Returns a list in request_ids order holding the status hash, the old
+    JSON string for keys not yet rewritten, or None for missing keys. Pass
+    each value to decode_status.
+    """
+    if not request_ids:
+        return []
+    values = _pipeline_statuses(redis_client, request_ids).execute(raise_on_error=False)
+    legacy = _legacy_positions(values)
+    if legacy:
+        for position, value in zip(legacy, redis_client.mget([status_key(request_ids[i]) for i in legacy])):
+            values[position] = value
+    return _finish(values)
+
+
+async def aread_statuses(redis_client, request_ids):
+    """Async variant of read_statuses for a redis.asyncio client"""
+    if not request_ids:
+        return []
+    values = await _pipeline_statuses(redis_client, request_ids).execute(raise_on_error=False)
+    legacy = _legacy_positions(values)
+    if legacy:
+        legacy_values = await redis_client.mget([status_key(request_ids[i]) for i in legacy])
+        for position, value in zip(legacy, legacy_values):
+            values[position] = value
+    return _finish(values)
+
+
+def write_status(redis_client, request_id, notification_status, error=None, ttl=3600, timestamp=None, log=True):
+    """Store a status change, keeping any reservation token, and announce it.
+
+    Pass a pipeline as redis_client to batch several writes. With log=False
+    the change is not appended to the status log, for writers that persist
+    it to the Notification table themselves.
+    """
+    code, epoch, error = encode_status(notification_status, error, timestamp)
+    script = redis_client.register_script(WRITE_SCRIPT)
+    return script(
+        keys=[status_key(request_id), settings.NOTIFICATION_STATUS_LOG_STREAM],
+        args=[code, epoch, error, ttl, settings.NOTIFICATION_STATUS_CHANNEL,
+              settings.NOTIFICATION_STATUS_LOG_MAXLEN, status_message(request_id, notification_status, error, epoch),
+              '1' if log else '0']
+    )
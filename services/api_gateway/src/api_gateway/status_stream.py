@@ -0,0 +1,100 @@
+import json
+import asyncio
+import logging
+
+from .status_store import aread_statuses, decode_status
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {'delivered', 'failed'}
+
+
+def format_event(status_data, event='status'):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(status_data)}\n\n"
+
+
+class StatusSubscriber:
+    """Shared Redis pub/sub subscription feeding every open status stream.
+
+    One subscriber runs per event loop. It listens on the status channel
+    while at least one stream is open and hands each update to the queues
+    registered for its notification_id. Updates are dropped for a queue
+    that is full rather than blocking the other streams.
+    """
+
+    def __init__(self, redis_client, channel, queue_size=100, reconnect_delay=1):
+        self.redis_client = redis_client
+        self.channel = channel
+        self.queue_size = queue_size
+        self.reconnect_delay = reconnect_delay
+        self._queues = {}  # request_id -> set of asyncio.Queue
+        self._task = None
+
+    def subscribe(self, request_ids):
+        """Register a new stream for request_ids and return its queue"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for request_id in request_ids:
+            self._queues.setdefault(request_id, set()).add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, request_ids, queue):
+        """Drop a stream; the listener stops with the last one"""
+        for request_id in request_ids:
+            queues = self._queues.get(request_id)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self._queues[request_id]
+        if not self._queues and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def dispatch(self, request_id, status_data):
+        for queue in list(self._queues.get(request_id, ())):
+            try:
+                queue.put_nowait(status_data)
+            except asyncio.QueueFull:
+                logger.warning(f"Status stream queue full, dropping update for {request_id}")
+
+    async def _resync(self):
+        """Replay current statuses for watched ids after a reconnect"""
+        request_ids = list(self._queues)
+        if not request_ids:
+            return
+        values = await aread_statuses(self.redis_client, request_ids)
+        for request_id, stored_status in zip(request_ids, values):
+            if stored_status:
+                self.dispatch(request_id, decode_status(request_id, stored_status))
+
+    def _handle(self, status_json):
+        try:
+            status_data = json.loads(status_json)
+            request_id = status_data['notification_id']
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring malformed status update: {e}")
+            return
+        self.dispatch(request_id, status_data)
+
+    async def _listen(self):
+        reconnecting = False
+        while self._queues:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                if reconnecting:
+                    await self._resync()
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self._handle(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Status subscriber lost its connection: {e}")
+                reconnecting = True
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                await pubsub.reset()
@@ -1,11 +1,19 @@
 from django.urls import path, include
-from . import views
+from . import views, async_views
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
 urlpatterns = [
     path('v1/users/', views.UserRegistrationView.as_view(), name='user_registration'),
+    path('v1/users/<str:user_id>/notifications/', views.notification_history, name='user_notification_history'),
     path('v1/notifications/', views.send_notification, name='send_notification'),
+    path('v1/notifications/batch/', views.send_notification_batch, name='send_notification_batch'),
+    path('v1/notifications/async/', async_views.send_notification_async, name='send_notification_async'),
+    path('v1/notifications/history/', views.notification_history, name='notification_history'),
+    path('v1/notifications/status/', views.get_notification_statuses, name='notification_statuses'),
+    path('v1/notifications/status/stream/', async_views.stream_notification_status, name='notification_status_stream'),
     path('v1/notifications/<str:request_id>/status/', views.get_notification_status, name='notification_status'),
+    path('v1/cache/invalidate/', views.invalidate_lookup_cache, name='invalidate_lookup_cache'),
+    path('v1/admin/dead-letters/', views.dead_letters, name='dead_letters'),
     path('health/', views.health_check, name='health_check'),
 
     # OpenAPI documentation
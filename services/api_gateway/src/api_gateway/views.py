@@ -2,13 +2,11 @@ import uuid
 import json
 import pika
 import logging
-import requests
-import httpx
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
@@ -26,7 +24,18 @@ from enum import Enum
 from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
-from .models import Notification
+from .models import Notification, bulk_create_unique
+from .outbox import build_outbox_row
+from .idempotency import release_request, release_requests, reserve_request, reserve_requests
+from .status_store import decode_status, read_status, read_statuses
+from django.db import IntegrityError
+from .http_clients import get_service_client
+from .lookup_cache import LookupCache
+from .history import HistoryQueryError, history_page, parse_fields, recent_notifications
+from .circuit_breaker import CircuitBreaker
+from .dead_letters import replay_dead_letters
+from .rabbitmq import amqp_priority, get_rabbitmq_connection, get_publisher_pool, get_confirming_publisher
+from concurrent.futures import TimeoutError as FutureTimeoutError, wait as wait_futures
 
 class NotificationStatus(str, Enum):
     delivered = "delivered"
@@ -43,49 +52,9 @@ class NotificationStatusData:
 # Setup logging
 logger = logging.getLogger(__name__)
 
-# RabbitMQ connection
-def get_rabbitmq_connection():
-    credentials = pika.PlainCredentials(
-        settings.RABBITMQ_USER,
-        settings.RABBITMQ_PASS
-    )
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(
-            settings.RABBITMQ_HOST,
-            settings.RABBITMQ_PORT,
-            '/',
-            credentials
-        )
-    )
-    return connection
-
-# Setup RabbitMQ queues
-def setup_queues(channel):
-    # Declare exchange
-    channel.exchange_declare(exchange='notifications.direct', exchange_type='direct')
-
-    # Declare dead-letter exchange
-    channel.exchange_declare(exchange='notifications.dlx', exchange_type='direct')
-
-    # Declare failed queue (dead-letter queue)
-    channel.queue_declare(queue='failed.queue', durable=True)
-    channel.queue_bind(exchange='notifications.dlx', queue='failed.queue', routing_key='failed')
-
-    # Declare email queue with dead-letter
-    channel.queue_declare(queue='email.queue', durable=True, arguments={
-        'x-dead-letter-exchange': 'notifications.dlx',
-        'x-dead-letter-routing-key': 'failed'
-    })
-    channel.queue_bind(exchange='notifications.direct', queue='email.queue', routing_key='email.queue')
-
-    # Declare push queue with dead-letter
-    channel.queue_declare(queue='push.queue', durable=True, arguments={
-        'x-dead-letter-exchange': 'notifications.dlx',
-        'x-dead-letter-routing-key': 'failed'
-    })
-    channel.queue_bind(exchange='notifications.direct', queue='push.queue', routing_key='push.queue')
-
 # Redis for idempotency and status tracking
+STATUS_TTL = 3600  # seconds
+
 redis_client = redis.Redis(
     host=settings.REDIS_HOST,
     port=settings.REDIS_PORT,
@@ -93,68 +62,48 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
+# Two-level caches for user and template existence checks
+user_contact_cache = LookupCache('user_contact', lambda: redis_client)
+template_cache = LookupCache('template', lambda: redis_client)
+
 # Circuit breaker state in Redis for multi-instance support
 CIRCUIT_BREAKER_THRESHOLD = 5
 CIRCUIT_BREAKER_TIMEOUT = 60  # seconds
+CIRCUIT_BREAKER_SNAPSHOT_TTL = 1  # seconds a process trusts its last closed state
+
+circuit_breaker = CircuitBreaker(
+    lambda: redis_client,
+    threshold=CIRCUIT_BREAKER_THRESHOLD,
+    timeout=CIRCUIT_BREAKER_TIMEOUT,
+    snapshot_ttl=CIRCUIT_BREAKER_SNAPSHOT_TTL
+)
 
 def get_circuit_breaker_state(service_name):
     """Get circuit breaker state from Redis"""
-    state = redis_client.hgetall(f"circuit_breaker:{service_name}")
-    if not state:
-        return {'failures': 0, 'last_failure_time': 0, 'state': 'closed'}
-    return {
-        'failures': int(state.get('failures', 0)),
-        'last_failure_time': float(state.get('last_failure_time', 0)),
-        'state': state.get('state', 'closed')
-    }
-
-def set_circuit_breaker_state(service_name, state):
-    """Set circuit breaker state in Redis"""
-    redis_client.hmset(f"circuit_breaker:{service_name}", state)
+    return circuit_breaker.state(service_name)
 
 def check_circuit_breaker(service_name):
     """Check if circuit breaker allows the request"""
-    state = get_circuit_breaker_state(service_name)
-    current_time = time.time()
-
-    if state['state'] == 'open':
-        if current_time - state['last_failure_time'] > CIRCUIT_BREAKER_TIMEOUT:
-            state['state'] = 'half-open'
-            set_circuit_breaker_state(service_name, state)
-            return True
-        return False
-    return True
+    return circuit_breaker.allow(service_name)
 
 def record_failure(service_name):
     """Record a failure in circuit breaker"""
-    state = get_circuit_breaker_state(service_name)
-    state['failures'] += 1
-    state['last_failure_time'] = time.time()
-
-    if state['failures'] >= CIRCUIT_BREAKER_THRESHOLD:
-        state['state'] = 'open'
-
-    set_circuit_breaker_state(service_name, state)
+    circuit_breaker.record_failure(service_name)
 
 def record_success(service_name):
     """Record a success in circuit breaker"""
-    state = get_circuit_breaker_state(service_name)
-    if state['state'] == 'half-open':
-        state['state'] = 'closed'
-        state['failures'] = 0
-        set_circuit_breaker_state(service_name, state)
-        
-        
+    circuit_breaker.record_success(service_name)
+
+
 class UserRegistrationView(APIView):
     """User registration endpoint"""
     permission_classes = [AllowAny]
 
     def post(self, request):
         data = request.data
-        user_service_url = f"http://user_service:5000/api/v1/users"
 
         try:
-            response = requests.post(user_service_url, json=data, timeout=5, verify=False)
+            response = get_service_client('user_service').post('/api/v1/users', json=data, verify=False)
             logger.info(f"User service response: status={response.status_code}, body={response.text}")
             if response.status_code == 201:
                 return Response({
@@ -219,6 +168,151 @@ def validate_notification_data(data):
 
     return errors
 
+def status_from_notification(notification):
+    """Build the status response fields from a persisted Notification row"""
+    status_data = notification.to_dataclass()
+    return {
+        'notification_id': status_data.notification_id,
+        'status': status_data.status.value,
+        'timestamp': status_data.timestamp.isoformat() if status_data.timestamp else None,
+        'error': status_data.error
+    }
+
+def notification_record(data):
+    """Fields the status persister needs to create a Notification row.
+
+    In outbox mode the request writes the row itself, so no record is sent.
+    """
+    if settings.NOTIFICATION_OUTBOX_ENABLED:
+        return None
+    return {
+        'user_id': data.get('user_id'),
+        'notification_type': data.get('notification_type'),
+        'template_code': data.get('template_code'),
+        'variables': data.get('variables', {}),
+        'priority': data.get('priority', 1),
+        'metadata': data.get('metadata', {})
+    }
+
+def reserve_notification(request_id, data=None):
+    """Atomically reserve request_id and store its pending status.
+
+    Returns the reservation token, or None for a duplicate request.
+    """
+    return reserve_request(
+        redis_client, request_id, STATUS_TTL, record=notification_record(data) if data else None
+    )
+
+def release_notification(request_id, token, error, notification_status=NotificationStatus.failed):
+    """Release a reservation so the request can be retried, storing the failure"""
+    release_request(redis_client, request_id, token, error, STATUS_TTL, notification_status)
+
+def persisted_status(request_id):
+    """(status, error) of the stored notification a duplicate request collided with"""
+    row = Notification.objects.filter(notification_id=request_id).values_list('status', 'error_message').first()
+    return row or (NotificationStatus.failed.value, 'Duplicate request')
+
+def notification_properties(request_id, priority=None):
+    return pika.BasicProperties(
+        delivery_mode=2,  # persistent
+        message_id=request_id,
+        priority=amqp_priority(priority)
+    )
+
+def publish_with_confirm(routing_key, request_id, message, token):
+    """Hand a message to the confirming publisher and return its confirm Future.
+
+    A broker nack releases the reservation and marks the notification
+    failed even if the request has already returned.
+    """
+    return get_confirming_publisher().publish(
+        exchange='notifications.direct',
+        routing_key=routing_key,
+        body=json.dumps(message),
+        properties=notification_properties(request_id, message.get('priority')),
+        on_nack=lambda reason: release_notification(request_id, token, reason)
+    )
+
+def get_request_id(data):
+    """Use the provided request_id or derive a deterministic one from the payload"""
+    request_id = data.get('request_id')
+    if request_id:
+        return request_id
+    request_fingerprint = (
+        f"{data.get('notification_type')}:{data.get('user_id')}:{data.get('template_code')}:"
+        f"{json.dumps(data.get('variables', {}), sort_keys=True)}"
+    )
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, request_fingerprint))
+
+def build_notification_message(request_id, data):
+    """Build the queue message body for a validated notification payload"""
+    return {
+        'request_id': request_id,
+        'user_id': data.get('user_id'),
+        'template_code': data.get('template_code'),
+        'variables': data.get('variables', {}),
+        'priority': data.get('priority', 1),
+        'metadata': data.get('metadata', {}),
+        'timestamp': time.time()
+    }
+
+def fetch_user_exists(user_id):
+    """Ask the user service whether a user exists (circuit breaker protected).
+
+    Returns None for answers that must not be cached, such as 5xx errors.
+    """
+    user_response = get_service_client('user_service').get(f"/users/{user_id}/contact")
+
+    if user_response.status_code != 200:
+        record_failure('user_service')
+        logger.error(f"User service error: {user_response.status_code}")
+        return False if user_response.status_code == 404 else None
+
+    record_success('user_service')
+    return True
+
+def fetch_template_exists(template_code):
+    """Ask the template service whether a template exists (circuit breaker protected)"""
+    template_response = get_service_client('template_service').get(f"/templates/{template_code}/exists/")
+
+    if template_response.status_code != 200:
+        record_failure('template_service')
+        logger.error(f"Template service error: {template_response.status_code}")
+        return False if template_response.status_code == 404 else None
+
+    record_success('template_service')
+    return True
+
+def validate_user_exists(user_id):
+    """Validate user exists, served from the lookup cache when possible"""
+    return user_contact_cache.get_or_load(user_id, lambda: fetch_user_exists(user_id))
+
+def validate_template_exists(template_code):
+    """Validate template exists, served from the lookup cache when possible"""
+    return template_cache.get_or_load(template_code, lambda: fetch_template_exists(template_code))
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def invalidate_lookup_cache(request):
+    """Drop cached user and template lookups, e.g. after a user or template is deleted"""
+    user_ids = request.data.get('user_ids', [])
+    template_codes = request.data.get('template_codes', [])
+    if not isinstance(user_ids, list) or not isinstance(template_codes, list):
+        return Response({
+            'success': False,
+            'error': 'user_ids and template_codes must be lists'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    for user_id in user_ids:
+        user_contact_cache.invalidate(user_id)
+    for template_code in template_codes:
+        template_cache.invalidate(template_code)
+
+    return Response({
+        'success': True,
+        'invalidated': {'user_ids': len(user_ids), 'template_codes': len(template_codes)}
+    }, status=status.HTTP_200_OK)
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 @ratelimit(key='user', rate='100/m', block=True)
@@ -241,10 +335,6 @@ def send_notification(request):
     notification_type = data.get('notification_type')
     user_id = data.get('user_id')
     template_code = data.get('template_code')
-    variables = data.get('variables', {})
-    request_id = data.get('request_id')
-    priority = data.get('priority', 1)
-    metadata = data.get('metadata', {})
 
     # Check circuit breaker for user service
     if not check_circuit_breaker('user_service'):
@@ -255,12 +345,11 @@ def send_notification(request):
         }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
     # Use provided request_id or generate one
-    if not request_id:
-        request_fingerprint = f"{notification_type}:{user_id}:{template_code}:{json.dumps(variables, sort_keys=True)}"
-        request_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, request_fingerprint))
+    request_id = get_request_id(data)
 
-    # Idempotency check
-    if redis_client.get(f"idempotency:{request_id}"):
+    # Idempotency reservation and initial status in one atomic call
+    token = reserve_notification(request_id, data)
+    if token is None:
         logger.info(f"Duplicate request detected: {request_id}")
         return Response({
             'success': False,
@@ -268,75 +357,68 @@ def send_notification(request):
             'request_id': request_id
         }, status=status.HTTP_409_CONFLICT)
 
-    # Store initial status as structured data
-    initial_status = NotificationStatusData(
-        notification_id=request_id,
-        status=NotificationStatus.pending,
-        timestamp=datetime.now()
-    )
-    redis_client.setex(f"status:{request_id}", 3600, json.dumps({
-        'notification_id': initial_status.notification_id,
-        'status': initial_status.status.value,
-        'timestamp': initial_status.timestamp.isoformat() if initial_status.timestamp else None,
-        'error': initial_status.error
-    }))
-    redis_client.setex(f"idempotency:{request_id}", 3600, 'processing')
-
     try:
-        # Validate user exists (circuit breaker protected)
-        user_service_url = f"http://user_service:5000/users/{user_id}/contact"
-        user_response = requests.get(user_service_url, timeout=5)
-
-        if user_response.status_code != 200:
-            record_failure('user_service')
-            logger.error(f"User service error: {user_response.status_code}")
+        if not validate_user_exists(user_id):
+            release_notification(request_id, token, 'User validation failed')
             return Response({
                 'success': False,
                 'error': 'User validation failed'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        record_success('user_service')
-
-        # Validate template exists (circuit breaker protected)
-        template_service_url = f"http://template_service:8081/templates/{template_code}"
-        template_response = requests.get(template_service_url, timeout=5)
-
-        if template_response.status_code != 200:
-            record_failure('template_service')
-            logger.error(f"Template service error: {template_response.status_code}")
+        if not validate_template_exists(template_code):
+            release_notification(request_id, token, 'Template validation failed')
             return Response({
                 'success': False,
                 'error': 'Template validation failed'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        record_success('template_service')
-
-        # Publish to queue
-        connection = get_rabbitmq_connection()
-        channel = connection.channel()
-        setup_queues(channel)
+        if settings.NOTIFICATION_OUTBOX_ENABLED:
+            # The outbox relay publishes the row; ingest never waits on the broker
+            try:
+                build_outbox_row(request_id, data).save()
+            except IntegrityError:
+                logger.info(f"Duplicate request detected in outbox: {request_id}")
+                # Drop the reservation and put back the stored notification's status
+                notification_status, error = persisted_status(request_id)
+                release_notification(request_id, token, error, notification_status)
+                return Response({
+                    'success': False,
+                    'error': 'Duplicate request',
+                    'request_id': request_id
+                }, status=status.HTTP_409_CONFLICT)
 
-        message = {
-            'request_id': request_id,
-            'user_id': user_id,
-            'template_code': template_code,
-            'variables': variables,
-            'priority': priority,
-            'metadata': metadata,
-            'timestamp': time.time()
-        }
+            logger.info(f"Notification stored in outbox: {request_id}")
+            return Response({
+                'success': True,
+                'message': 'Notification accepted',
+                'request_id': request_id,
+                'type': notification_type
+            }, status=status.HTTP_202_ACCEPTED)
 
+        message = build_notification_message(request_id, data)
         routing_key = f'{notification_type}.queue'
-        channel.basic_publish(
-            exchange='notifications.direct',
-            routing_key=routing_key,
-            body=json.dumps(message),
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # persistent
-                message_id=request_id
+
+        if settings.RABBITMQ_PUBLISHER_CONFIRMS:
+            # Micro-batched publish; a nack raises PublishNacked
+            future = publish_with_confirm(routing_key, request_id, message, token)
+            try:
+                future.result(timeout=settings.RABBITMQ_CONFIRM_TIMEOUT)
+            except FutureTimeoutError:
+                logger.warning(f"Broker confirm still pending: {request_id}")
+                return Response({
+                    'success': True,
+                    'message': 'Notification accepted, broker confirmation pending',
+                    'request_id': request_id,
+                    'type': notification_type
+                }, status=status.HTTP_202_ACCEPTED)
+        else:
+            # Publish to queue on a pooled, long-lived channel
+            get_publisher_pool().publish(
+                exchange='notifications.direct',
+                routing_key=routing_key,
+                body=json.dumps(message),
+                properties=notification_properties(request_id, message.get('priority'))
             )
-        )
-        connection.close()
 
         logger.info(f"Notification queued: {request_id}")
         return Response({
@@ -349,24 +431,189 @@ def send_notification(request):
     except Exception as e:
         record_failure('general')
         logger.error(f"Error processing notification: {str(e)}")
-        # Store failed status with error details
-        failed_status = NotificationStatusData(
-            notification_id=request_id,
-            status=NotificationStatus.failed,
-            timestamp=datetime.now(),
-            error=str(e)
-        )
-        redis_client.setex(f"status:{request_id}", 3600, json.dumps({
-            'notification_id': failed_status.notification_id,
-            'status': failed_status.status.value,
-            'timestamp': failed_status.timestamp.isoformat() if failed_status.timestamp else None,
-            'error': failed_status.error
-        }))
+        # Store failed status with error details and allow a retry
+        release_notification(request_id, token, str(e))
         return Response({
             'success': False,
             'error': 'Internal server error'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@ratelimit(key='user', rate='100/m', block=True)
+def send_notification_batch(request):
+    """Queue a batch of notifications with pipelined Redis writes and one channel"""
+    logger.info(f"Batch notification request from {request.META.get('REMOTE_ADDR')}")
+
+    payloads = request.data
+    if isinstance(payloads, dict):
+        payloads = payloads.get('notifications')
+    if not isinstance(payloads, list) or not payloads:
+        return Response({
+            'success': False,
+            'error': 'Request body must be a non-empty array of notifications'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(payloads) > settings.NOTIFICATION_BATCH_MAX_SIZE:
+        return Response({
+            'success': False,
+            'error': f'Batch size exceeds the maximum of {settings.NOTIFICATION_BATCH_MAX_SIZE}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if not check_circuit_breaker('user_service'):
+        logger.warning("Circuit breaker is open for user service, rejecting batch")
+        return Response({
+            'success': False,
+            'error': 'Service temporarily unavailable'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    results = [None] * len(payloads)
+    candidates = []  # (index, request_id, data)
+    seen_request_ids = set()
+
+    for index, data in enumerate(payloads):
+        if not isinstance(data, dict):
+            results[index] = {'success': False, 'error': 'Validation failed',
+                              'details': ['notification must be an object']}
+            continue
+        validation_errors = validate_notification_data(data)
+        if validation_errors:
+            results[index] = {'success': False, 'error': 'Validation failed', 'details': validation_errors}
+            continue
+        request_id = get_request_id(data)
+        if request_id in seen_request_ids:
+            results[index] = {'success': False, 'error': 'Duplicate request', 'request_id': request_id}
+            continue
+        seen_request_ids.add(request_id)
+        candidates.append((index, request_id, data))
+
+    # Reserve the whole batch and store initial statuses in one round trip
+    tokens = reserve_requests(redis_client, [
+        request_id for _, request_id, _ in candidates
+    ], STATUS_TTL, records={
+        request_id: notification_record(data)
+        for _, request_id, data in candidates
+    })
+
+    accepted = []
+    for index, request_id, data in candidates:
+        if tokens[request_id] is None:
+            results[index] = {'success': False, 'error': 'Duplicate request', 'request_id': request_id}
+        else:
+            accepted.append((index, request_id, data))
+
+    failed = []  # (index, request_id, error)
+    publishable = []
+    try:
+        # Each distinct user and template is validated once per batch
+        valid_users = {}
+        valid_templates = {}
+        for index, request_id, data in accepted:
+            user_id = data.get('user_id')
+            template_code = data.get('template_code')
+            if user_id not in valid_users:
+                valid_users[user_id] = validate_user_exists(user_id)
+            if not valid_users[user_id]:
+                failed.append((index, request_id, 'User validation failed'))
+                continue
+            if template_code not in valid_templates:
+                valid_templates[template_code] = validate_template_exists(template_code)
+            if not valid_templates[template_code]:
+                failed.append((index, request_id, 'Template validation failed'))
+                continue
+            publishable.append((index, request_id, data))
+    except Exception as e:
+        record_failure('general')
+        logger.error(f"Error validating notification batch: {str(e)}")
+        done = {index for index, _, _ in failed + publishable}
+        failed.extend((index, request_id, 'Internal server error')
+                      for index, request_id, _ in accepted if index not in done)
+
+    published = 0
+    if publishable and settings.NOTIFICATION_OUTBOX_ENABLED:
+        # Insert the whole batch into the outbox with one statement
+        existing_ids = set(Notification.objects.filter(
+            notification_id__in=[request_id for _, request_id, _ in publishable]
+        ).values_list('notification_id', flat=True))
+        rows = []
+        for index, request_id, data in publishable:
+            if request_id in existing_ids:
+                results[index] = {'success': False, 'error': 'Duplicate request', 'request_id': request_id}
+                continue
+            rows.append(build_outbox_row(request_id, data))
+            results[index] = {
+                'success': True,
+                'request_id': request_id,
+                'type': data.get('notification_type')
+            }
+        try:
+            created = {notification.notification_id for notification in bulk_create_unique(rows)}
+            published = len(created)
+            for index, request_id, _ in publishable:
+                if request_id not in existing_ids and request_id not in created:
+                    results[index] = {'success': False, 'error': 'Duplicate request', 'request_id': request_id}
+        except Exception as e:
+            record_failure('general')
+            logger.error(f"Error storing notification batch in outbox: {str(e)}")
+            failed.extend((index, request_id, 'Internal server error')
+                          for index, request_id, _ in publishable if request_id not in existing_ids)
+    elif publishable and settings.RABBITMQ_PUBLISHER_CONFIRMS:
+        # Hand the batch to the confirming publisher and wait for its confirms
+        futures = [
+            publish_with_confirm(f"{data.get('notification_type')}.queue", request_id,
+                                 build_notification_message(request_id, data), tokens[request_id])
+            for _, request_id, data in publishable
+        ]
+        wait_futures(futures, timeout=settings.RABBITMQ_CONFIRM_TIMEOUT)
+        for (index, request_id, data), future in zip(publishable, futures):
+            if future.done() and future.exception() is not None:
+                failed.append((index, request_id, str(future.exception())))
+                continue
+            results[index] = {
+                'success': True,
+                'request_id': request_id,
+                'type': data.get('notification_type'),
+                'confirmed': future.done()
+            }
+            published += 1
+    elif publishable:
+        # Publish the whole batch on a single pooled channel
+        try:
+            with get_publisher_pool().channel() as channel:
+                for index, request_id, data in publishable:
+                    channel.basic_publish(
+                        exchange='notifications.direct',
+                        routing_key=f"{data.get('notification_type')}.queue",
+                        body=json.dumps(build_notification_message(request_id, data)),
+                        properties=notification_properties(request_id, data.get('priority'))
+                    )
+                    results[index] = {
+                        'success': True,
+                        'request_id': request_id,
+                        'type': data.get('notification_type')
+                    }
+                    published += 1
+        except Exception as e:
+            record_failure('general')
+            logger.error(f"Error publishing notification batch: {str(e)}")
+            failed.extend((index, request_id, 'Internal server error')
+                          for index, request_id, _ in publishable[published:])
+
+    # Release failed reservations and store their statuses in one round trip
+    for index, request_id, error in failed:
+        results[index] = {'success': False, 'error': error, 'request_id': request_id}
+    release_requests(redis_client, [
+        (request_id, tokens[request_id], error) for _, request_id, error in failed
+    ], STATUS_TTL)
+
+    logger.info(f"Notification batch queued: {published}/{len(payloads)}")
+    return Response({
+        'success': published == len(payloads),
+        'queued': published,
+        'rejected': len(payloads) - published,
+        'results': results
+    }, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 @cache_page(60)  # Cache for 60 seconds
@@ -378,33 +625,186 @@ def get_notification_status(request, request_id):
             'error': 'request_id is required'
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    status_json = redis_client.get(f"status:{request_id}")
-    if not status_json:
+    stored_status = read_status(redis_client, request_id)
+    if not stored_status:
+        # Read through to the persisted history once the Redis key has expired
+        notification = recent_notifications().filter(notification_id=request_id).first()
+        if notification is not None:
+            return Response({'success': True, **status_from_notification(notification)}, status=status.HTTP_200_OK)
         return Response({
             'success': False,
             'error': 'Notification not found'
         }, status=status.HTTP_404_NOT_FOUND)
 
+    return Response({'success': True, **decode_status(request_id, stored_status)}, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def get_notification_statuses(request):
+    """Get the statuses of many notifications in one pipelined round trip.
+
+    Takes {"request_ids": [...]}; ids without a status map to null and
+    are also listed under "missing".
+    """
+    request_ids = request.data.get('request_ids') if isinstance(request.data, dict) else None
+    if not isinstance(request_ids, list) or not request_ids:
+        return Response({
+            'success': False,
+            'error': 'request_ids must be a non-empty array'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if not all(isinstance(request_id, str) and request_id for request_id in request_ids):
+        return Response({
+            'success': False,
+            'error': 'request_ids must contain non-empty strings'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Preserve the caller's order while dropping repeated ids
+    request_ids = list(dict.fromkeys(request_ids))
+    if len(request_ids) > settings.NOTIFICATION_STATUS_BULK_MAX_SIZE:
+        return Response({
+            'success': False,
+            'error': f'At most {settings.NOTIFICATION_STATUS_BULK_MAX_SIZE} request_ids per query'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    values = read_statuses(redis_client, request_ids)
+
+    statuses = {}
+    for request_id, stored_status in zip(request_ids, values):
+        statuses[request_id] = decode_status(request_id, stored_status) if stored_status else None
+
+    # Read through to the persisted history for expired keys in one query
+    expired = [request_id for request_id, status_data in statuses.items() if status_data is None]
+    if expired:
+        for notification in recent_notifications().filter(notification_id__in=expired):
+            statuses[notification.notification_id] = status_from_notification(notification)
+
+    missing = []
+    for request_id, status_data in statuses.items():
+        if status_data is None:
+            missing.append(request_id)
+        else:
+            del status_data['notification_id']  # already the map key
+
+    return Response({
+        'success': True,
+        'statuses': statuses,
+        'missing': missing
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def notification_history(request, user_id=None):
+    """List notifications newest first with keyset (cursor) pagination.
+
+    Filters: user_id (or the user in the URL), status (comma separated),
+    created_after, created_before. ?fields= selects the returned fields and
+    ?cursor= continues from the next_cursor of the previous page.
+    Only admins may read other users' notifications; everyone else sees
+    just the notifications whose user_id is their username.
+    """
+    params = request.query_params
+    user_id = user_id or params.get('user_id')
+    if not request.user.is_staff:
+        own_id = request.user.get_username()
+        if user_id and user_id != own_id:
+            return Response({
+                'success': False,
+                'error': "Not allowed to read another user's notifications"
+            }, status=status.HTTP_403_FORBIDDEN)
+        user_id = own_id
     try:
-        # Parse the JSON status data
-        status_data = json.loads(status_json)
+        limit = int(params.get('limit', settings.NOTIFICATION_HISTORY_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= settings.NOTIFICATION_HISTORY_MAX_PAGE_SIZE:
         return Response({
-            'success': True,
-            'notification_id': status_data['notification_id'],
-            'status': status_data['status'],
-            'timestamp': status_data.get('timestamp'),
-            'error': status_data.get('error')
-        }, status=status.HTTP_200_OK)
-    except (json.JSONDecodeError, KeyError) as e:
-        logger.error(f"Error parsing status data for {request_id}: {str(e)}")
-        # Fallback for old format or corrupted data
+            'success': False,
+            'error': f'limit must be between 1 and {settings.NOTIFICATION_HISTORY_MAX_PAGE_SIZE}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    statuses = [value.strip() for value in params.get('status', '').split(',') if value.strip()]
+    try:
+        results, next_cursor = history_page(
+            user_id=user_id,
+            statuses=statuses,
+            created_after=params.get('created_after'),
+            created_before=params.get('created_before'),
+            fields=parse_fields(params.get('fields')),
+            cursor=params.get('cursor'),
+            limit=limit
+        )
+    except HistoryQueryError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        'results': results,
+        'next_cursor': next_cursor
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdminUser])
+def dead_letters(request):
+    """Summarize or replay dead-lettered notifications in failed.queue.
+
+    GET groups the dead letters by failure reason and queue without
+    changing anything. POST {"groups": [...] or "all", "dry_run", "limit",
+    "rate", "concurrency"} republishes the selected groups to their
+    original routing keys. A request examines at most
+    DLQ_REPLAY_MAX_PER_REQUEST messages, and a rate-limited replay at most
+    DLQ_REPLAY_MAX_REQUEST_SECONDS worth at its rate, so the request never
+    holds a worker for long; large queues take several calls or the
+    replay_dead_letters command. The response reports the limit applied.
+    """
+    data = request.data if request.method == 'POST' and isinstance(request.data, dict) else {}
+    params = data or request.query_params
+    groups = data.get('groups')
+    dry_run = request.method == 'GET' or bool(data.get('dry_run', False))
+    if not dry_run and groups != 'all' and not (
+        isinstance(groups, list) and groups and all(isinstance(group, str) for group in groups)
+    ):
         return Response({
-            'success': True,
-            'notification_id': request_id,
-            'status': status_json,  # Return raw value
-            'timestamp': time.time(),
-            'error': None
-        }, status=status.HTTP_200_OK)
+            'success': False,
+            'error': 'groups must be "all" or a non-empty list of reason:queue groups'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = int(params.get('limit', settings.DLQ_REPLAY_MAX_PER_REQUEST))
+        rate = float(params.get('rate', settings.DLQ_REPLAY_RATE))
+        concurrency = int(params.get('concurrency', settings.DLQ_REPLAY_CONCURRENCY))
+    except (TypeError, ValueError):
+        return Response({
+            'success': False,
+            'error': 'limit, rate and concurrency must be numbers'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, settings.DLQ_REPLAY_MAX_PER_REQUEST))
+    if not dry_run and rate > 0:
+        limit = max(1, min(limit, int(rate * settings.DLQ_REPLAY_MAX_REQUEST_SECONDS)))
+
+    connection = get_rabbitmq_connection()
+    try:
+        summary = replay_dead_letters(
+            connection.channel(),
+            None if dry_run else get_confirming_publisher(),
+            groups=None if groups == 'all' else set(groups or []),
+            dry_run=dry_run,
+            limit=limit,
+            rate=rate,
+            concurrency=max(1, concurrency)
+        )
+    finally:
+        connection.close()
+
+    logger.info(f"Dead letter {'summary' if dry_run else 'replay'} by {request.user}: {summary}")
+    return Response({
+        'success': True,
+        'dry_run': dry_run,
+        'limit': limit,
+        'examined': sum(stats['messages'] for stats in summary.values()),
+        'replayed': sum(stats['replayed'] for stats in summary.values()),
+        'groups': summary
+    }, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -442,6 +842,10 @@ def health_check(request):
             'template_service': get_circuit_breaker_state('template_service')['state'],
             'general': get_circuit_breaker_state('general')['state']
         },
+        'lookup_cache': {
+            'user_contact': user_contact_cache.stats(),
+            'template': template_cache.stats()
+        },
         'timestamp': time.time()
     }, status=status.HTTP_200_OK)
 
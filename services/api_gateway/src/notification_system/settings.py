@@ -82,6 +82,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'notification_system.wsgi.application'
+ASGI_APPLICATION = 'notification_system.asgi.application'
 
 
 # Database
@@ -148,10 +149,130 @@ RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', 'rabbitmq')
 RABBITMQ_PORT = int(os.getenv('RABBITMQ_PORT', 5672))
 RABBITMQ_USER = os.getenv('RABBITMQ_USER', 'admin')
 RABBITMQ_PASS = os.getenv('RABBITMQ_PASS', 'admin')
+RABBITMQ_HEARTBEAT = int(os.getenv('RABBITMQ_HEARTBEAT', 60))
+RABBITMQ_PUBLISHER_POOL_SIZE = int(os.getenv('RABBITMQ_PUBLISHER_POOL_SIZE', 4))
+RABBITMQ_PUBLISHER_ACQUIRE_TIMEOUT = float(os.getenv('RABBITMQ_PUBLISHER_ACQUIRE_TIMEOUT', 5))
+RABBITMQ_RECONNECT_DELAY = float(os.getenv('RABBITMQ_RECONNECT_DELAY', 1))
+
+# Work queues are declared with x-max-priority and messages carry the
+# request's priority clamped to this range; it must match the consumer
+# services. RabbitMQ keeps one sub-queue per level, so keep it small.
+RABBITMQ_MAX_PRIORITY = int(os.getenv('RABBITMQ_MAX_PRIORITY', 10))
+
+# Retry tiers: a failed delivery waits in a delay queue whose x-message-ttl
+# is the tier's delay (ms) and then dead-letters back to its work queue.
+# The gateway only declares the tiers; the consumer services (retry.js)
+# read the same RABBITMQ_RETRY_DELAYS, pick the tier for each attempt and
+# dead-letter after RABBITMQ_RETRY_MAX_ATTEMPTS deliveries.
+RABBITMQ_RETRY_DELAYS = [
+    int(delay) for delay in os.getenv('RABBITMQ_RETRY_DELAYS', '5000,30000,120000,600000').split(',') if delay
+]
+
+# Publisher confirms: messages are micro-batched by a background publisher
+RABBITMQ_PUBLISHER_CONFIRMS = os.getenv('RABBITMQ_PUBLISHER_CONFIRMS', 'true').lower() == 'true'
+RABBITMQ_CONFIRM_BATCH_SIZE = int(os.getenv('RABBITMQ_CONFIRM_BATCH_SIZE', 100))
+RABBITMQ_CONFIRM_LINGER = float(os.getenv('RABBITMQ_CONFIRM_LINGER', 0.005))  # seconds
+RABBITMQ_CONFIRM_TIMEOUT = float(os.getenv('RABBITMQ_CONFIRM_TIMEOUT', 5))  # seconds
 
 REDIS_HOST = os.getenv('REDIS_HOST', 'redis')
 REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
 
+# Downstream services, reached through pooled keep-alive clients (api_gateway.http_clients)
+HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', 0.1))  # seconds
+DOWNSTREAM_SERVICES = {
+    'user_service': {
+        'base_url': os.getenv('USER_SERVICE_URL', 'http://user_service:5000'),
+        'pool_size': int(os.getenv('USER_SERVICE_POOL_SIZE', 20)),
+        'timeout': float(os.getenv('USER_SERVICE_TIMEOUT', 5)),
+        'connect_timeout': float(os.getenv('USER_SERVICE_CONNECT_TIMEOUT', 1)),
+        'retries': int(os.getenv('USER_SERVICE_RETRIES', 2)),
+    },
+    'template_service': {
+        'base_url': os.getenv('TEMPLATE_SERVICE_URL', 'http://template_service:8081'),
+        'pool_size': int(os.getenv('TEMPLATE_SERVICE_POOL_SIZE', 20)),
+        'timeout': float(os.getenv('TEMPLATE_SERVICE_TIMEOUT', 5)),
+        'connect_timeout': float(os.getenv('TEMPLATE_SERVICE_CONNECT_TIMEOUT', 1)),
+        'retries': int(os.getenv('TEMPLATE_SERVICE_RETRIES', 2)),
+    },
+}
+
+# Two-level (in-process LRU + Redis) cache for user and template existence checks
+LOOKUP_CACHE_MAX_ENTRIES = int(os.getenv('LOOKUP_CACHE_MAX_ENTRIES', 10000))
+LOOKUP_CACHE_LOCAL_TTL = float(os.getenv('LOOKUP_CACHE_LOCAL_TTL', 5))  # seconds
+LOOKUP_CACHE_TTL = int(os.getenv('LOOKUP_CACHE_TTL', 300))  # seconds
+LOOKUP_CACHE_NEGATIVE_TTL = int(os.getenv('LOOKUP_CACHE_NEGATIVE_TTL', 30))  # seconds
+
+# Maximum number of notifications accepted by the batch endpoint
+NOTIFICATION_BATCH_MAX_SIZE = int(os.getenv('NOTIFICATION_BATCH_MAX_SIZE', 1000))
+# Maximum number of request_ids per bulk status query
+NOTIFICATION_STATUS_BULK_MAX_SIZE = int(os.getenv('NOTIFICATION_STATUS_BULK_MAX_SIZE', 1000))
+
+# Every status:{id} write is also published on this channel; the SSE
+# status stream (ASGI only) is fed from it
+NOTIFICATION_STATUS_CHANNEL = os.getenv('NOTIFICATION_STATUS_CHANNEL', 'notification_status')
+STATUS_STREAM_MAX_IDS = int(os.getenv('STATUS_STREAM_MAX_IDS', 100))
+STATUS_STREAM_TIMEOUT = float(os.getenv('STATUS_STREAM_TIMEOUT', 300))  # seconds
+STATUS_STREAM_HEARTBEAT = float(os.getenv('STATUS_STREAM_HEARTBEAT', 15))  # seconds
+
+# Every status write is also appended to this capped Redis stream; the
+# write-behind persister (manage.py persist_statuses) drains it into the
+# Notification table in batches
+NOTIFICATION_STATUS_LOG_STREAM = os.getenv('NOTIFICATION_STATUS_LOG_STREAM', 'notification_status_log')
+NOTIFICATION_STATUS_LOG_MAXLEN = int(os.getenv('NOTIFICATION_STATUS_LOG_MAXLEN', 1000000))
+STATUS_PERSIST_GROUP = os.getenv('STATUS_PERSIST_GROUP', 'status_persister')
+STATUS_PERSIST_BATCH_SIZE = int(os.getenv('STATUS_PERSIST_BATCH_SIZE', 500))
+STATUS_PERSIST_FLUSH_INTERVAL = float(os.getenv('STATUS_PERSIST_FLUSH_INTERVAL', 1))  # seconds
+# Backoff after a failed batch, doubling up to the maximum (seconds)
+STATUS_PERSIST_RETRY_DELAY = float(os.getenv('STATUS_PERSIST_RETRY_DELAY', 1))
+STATUS_PERSIST_MAX_RETRY_DELAY = float(os.getenv('STATUS_PERSIST_MAX_RETRY_DELAY', 30))
+# Entries left pending this long by another consumer are claimed (milliseconds)
+STATUS_PERSIST_CLAIM_IDLE_MS = int(os.getenv('STATUS_PERSIST_CLAIM_IDLE_MS', 60000))
+# Status log entries the persister cannot write (bad JSON or data the table
+# rejects) are copied here with the error, then acknowledged
+STATUS_PERSIST_DEAD_LETTER_STREAM = os.getenv('STATUS_PERSIST_DEAD_LETTER_STREAM', 'notification_status_log:dead')
+
+# Page sizes for the keyset-paginated notification history
+NOTIFICATION_HISTORY_PAGE_SIZE = int(os.getenv('NOTIFICATION_HISTORY_PAGE_SIZE', 50))
+NOTIFICATION_HISTORY_MAX_PAGE_SIZE = int(os.getenv('NOTIFICATION_HISTORY_MAX_PAGE_SIZE', 200))
+
+# Notification table partitions (PostgreSQL): monthly ranges on created_at.
+# manage.py notification_retention creates upcoming months, and copies each
+# month that ended more than NOTIFICATION_RETENTION_DAYS ago to the archive
+# before detaching and dropping it whole; rows are never deleted one by one.
+# The window is the longest any status needs. 0 keeps every month.
+NOTIFICATION_PARTITIONS_AHEAD = int(os.getenv('NOTIFICATION_PARTITIONS_AHEAD', 3))
+NOTIFICATION_ARCHIVE_DIR = os.getenv('NOTIFICATION_ARCHIVE_DIR', '')
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', 90))
+# Status read-through and history default to this window, so hot queries
+# are pruned to the most recent partitions
+NOTIFICATION_HOT_WINDOW_DAYS = int(os.getenv('NOTIFICATION_HOT_WINDOW_DAYS', 31))
+
+# Status ingestion: result messages from the consumer services are applied
+# in batches of STATUS_INGEST_BATCH_SIZE, or after STATUS_INGEST_FLUSH_INTERVAL
+# seconds. The prefetch should exceed the batch size so the next batch
+# arrives during a flush.
+STATUS_INGEST_BATCH_SIZE = int(os.getenv('STATUS_INGEST_BATCH_SIZE', 200))
+STATUS_INGEST_PREFETCH = int(os.getenv('STATUS_INGEST_PREFETCH', 400))
+STATUS_INGEST_FLUSH_INTERVAL = float(os.getenv('STATUS_INGEST_FLUSH_INTERVAL', 0.5))  # seconds
+
+# Dead letter replay: failed.queue is drained in batches, replayed messages
+# are published at most DLQ_REPLAY_RATE per second (0 for no limit) with at
+# most DLQ_REPLAY_CONCURRENCY awaiting their confirm
+DLQ_REPLAY_BATCH_SIZE = int(os.getenv('DLQ_REPLAY_BATCH_SIZE', 100))
+DLQ_REPLAY_RATE = float(os.getenv('DLQ_REPLAY_RATE', 50))
+DLQ_REPLAY_CONCURRENCY = int(os.getenv('DLQ_REPLAY_CONCURRENCY', 20))
+DLQ_REPLAY_MAX_PER_REQUEST = int(os.getenv('DLQ_REPLAY_MAX_PER_REQUEST', 1000))
+# A rate-limited replay through the API examines at most rate times this
+# many seconds' worth of messages, so it finishes well within a request
+# timeout; larger replays belong to manage.py replay_dead_letters
+DLQ_REPLAY_MAX_REQUEST_SECONDS = float(os.getenv('DLQ_REPLAY_MAX_REQUEST_SECONDS', 10))
+
+# Outbox mode: requests insert a pending Notification row and a separate
+# relay (manage.py relay_outbox) publishes it
+NOTIFICATION_OUTBOX_ENABLED = os.getenv('NOTIFICATION_OUTBOX_ENABLED', 'false').lower() == 'true'
+OUTBOX_RELAY_BATCH_SIZE = int(os.getenv('OUTBOX_RELAY_BATCH_SIZE', 500))
+OUTBOX_RELAY_POLL_INTERVAL = float(os.getenv('OUTBOX_RELAY_POLL_INTERVAL', 0.5))  # seconds
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -1,4 +1,5 @@
 const amqp = require("amqplib");
+const { assertRetryQueues, scheduleRetry } = require("./retry");
 const nodemailer = require("nodemailer");
 const redis = require("redis");
 const fastify = require("fastify")({ logger: true });
@@ -20,6 +21,29 @@ redisClient.connect().catch((err) => {
   console.error("Redis connection error:", err);
 });
 
+const MAX_PRIORITY = parseInt(process.env.RABBITMQ_MAX_PRIORITY || "10", 10);
+const PREFETCH = parseInt(process.env.RABBITMQ_PREFETCH || "10", 10);
+
+// Delivery results go to the results queue; the gateway's ingest_statuses
+// workers apply them to status:{id} and the Notification table in batches
+const RESULTS_ROUTING_KEY = "status.results";
+const RESULTS_QUEUE = "status.results.queue";
+
+function publishResult(channel, statusData) {
+  const result = {
+    request_id: statusData.notification_id,
+    status: statusData.status,
+    timestamp: statusData.timestamp,
+    error: statusData.error,
+  };
+  channel.publish(
+    "notifications.direct",
+    RESULTS_ROUTING_KEY,
+    Buffer.from(JSON.stringify(result)),
+    { persistent: true, contentType: "application/json" }
+  );
+}
+
 // Email transporter
 const transporter = nodemailer.createTransport({
   host: process.env.SMTP_HOST || "smtp.gmail.com",
@@ -41,29 +65,44 @@ async function connectRabbitMQ() {
       process.env.RABBITMQ_URL ||
       `amqp://${rabbitmqUser}:${rabbitmqPass}@${rabbitmqHost}`;
     const connection = await amqp.connect(rabbitmqUrl);
-    const channel = await connection.createChannel();
+    // Confirm channel so a retry copy is acked only once the broker has it
+    const channel = await connection.createConfirmChannel();
 
     // Declare exchange and queue with explicit options
     await channel.assertExchange("notifications.direct", "direct", {
       durable: false,
     });
-    await channel.assertQueue("email.queue", {
+    // Priority queue bound to the legacy email.queue routing key; see
+    // WORK_QUEUES in api_gateway/rabbitmq.py. The arguments must match the
+    // gateway's declaration exactly.
+    await channel.assertQueue("email.priority.queue", {
       durable: true,
       arguments: {
         "x-dead-letter-exchange": "notifications.dlx",
         "x-dead-letter-routing-key": "failed",
+        "x-max-priority": MAX_PRIORITY,
       },
     });
     await channel.bindQueue(
-      "email.queue",
+      "email.priority.queue",
       "notifications.direct",
       "email.queue"
     );
+    // Priority only reorders messages still in the queue, so hold a small
+    // window of unacknowledged deliveries instead of the whole backlog
+    await channel.prefetch(PREFETCH);
+    await assertRetryQueues(channel);
+    await channel.assertQueue(RESULTS_QUEUE, { durable: true });
+    await channel.bindQueue(
+      RESULTS_QUEUE,
+      "notifications.direct",
+      RESULTS_ROUTING_KEY
+    );
 
     console.log("Email service connected to RabbitMQ");
 
     // Consume messages
-    channel.consume("email.queue", async (msg) => {
+    channel.consume("email.priority.queue", async (msg) => {
       if (msg) {
         let message = null;
         let requestId = "unknown";
@@ -125,17 +164,23 @@ async function connectRabbitMQ() {
             timestamp: new Date().toISOString(),
             error: null,
           };
-          await redisClient.setEx(
-            `status:${message.request_id}`,
-            3600,
-            JSON.stringify(statusData)
-          );
+          publishResult(channel, statusData);
 
           channel.ack(msg);
         } catch (error) {
           console.error("Error processing email:", error);
+          try {
+            if (await scheduleRetry(channel, msg)) {
+              return;
+            }
+          } catch (retryError) {
+            // The retry copy was not confirmed; requeue the original instead
+            console.error("Failed to schedule email retry:", retryError);
+            channel.nack(msg, false, true);
+            return;
+          }
 
-          // Update status to 'failed' with error details
+          // Out of attempts: update status to 'failed' with error details
           // Try to get request_id from message if available, otherwise use extracted requestId
           const failedRequestId = message?.request_id || requestId;
           const statusData = {
@@ -144,13 +189,9 @@ async function connectRabbitMQ() {
             timestamp: new Date().toISOString(),
             error: error.message,
           };
-          await redisClient.setEx(
-            `status:${failedRequestId}`,
-            3600,
-            JSON.stringify(statusData)
-          );
+          publishResult(channel, statusData);
 
-          channel.nack(msg, false, false); // Don't requeue
+          channel.nack(msg, false, false); // Dead-letter to failed.queue
         }
       }
     });
@@ -1,4 +1,5 @@
 const amqp = require("amqplib");
+const { assertRetryQueues, scheduleRetry } = require("./retry");
 const redis = require("redis");
 const admin = require("firebase-admin");
 const fastify = require("fastify")({ logger: true });
@@ -47,6 +48,29 @@ redisClient.connect().catch((err) => {
   console.error("Redis connection error:", err);
 });
 
+const MAX_PRIORITY = parseInt(process.env.RABBITMQ_MAX_PRIORITY || "10", 10);
+const PREFETCH = parseInt(process.env.RABBITMQ_PREFETCH || "10", 10);
+
+// Delivery results go to the results queue; the gateway's ingest_statuses
+// workers apply them to status:{id} and the Notification table in batches
+const RESULTS_ROUTING_KEY = "status.results";
+const RESULTS_QUEUE = "status.results.queue";
+
+function publishResult(channel, statusData) {
+  const result = {
+    request_id: statusData.notification_id,
+    status: statusData.status,
+    timestamp: statusData.timestamp,
+    error: statusData.error,
+  };
+  channel.publish(
+    "notifications.direct",
+    RESULTS_ROUTING_KEY,
+    Buffer.from(JSON.stringify(result)),
+    { persistent: true, contentType: "application/json" }
+  );
+}
+
 // Connect to RabbitMQ
 async function connectRabbitMQ() {
   try {
@@ -57,25 +81,44 @@ async function connectRabbitMQ() {
       process.env.RABBITMQ_URL ||
       `amqp://${rabbitmqUser}:${rabbitmqPass}@${rabbitmqHost}`;
     const connection = await amqp.connect(rabbitmqUrl);
-    const channel = await connection.createChannel();
+    // Confirm channel so a retry copy is acked only once the broker has it
+    const channel = await connection.createConfirmChannel();
 
     // Declare exchange and queue
     await channel.assertExchange("notifications.direct", "direct", {
       durable: false,
     });
-    await channel.assertQueue("push.queue", {
+    // Priority queue bound to the legacy push.queue routing key; see
+    // WORK_QUEUES in api_gateway/rabbitmq.py. The arguments must match the
+    // gateway's declaration exactly.
+    await channel.assertQueue("push.priority.queue", {
       durable: true,
       arguments: {
         "x-dead-letter-exchange": "notifications.dlx",
         "x-dead-letter-routing-key": "failed",
+        "x-max-priority": MAX_PRIORITY,
       },
     });
-    await channel.bindQueue("push.queue", "notifications.direct", "push.queue");
+    await channel.bindQueue(
+      "push.priority.queue",
+      "notifications.direct",
+      "push.queue"
+    );
+    // Priority only reorders messages still in the queue, so hold a small
+    // window of unacknowledged deliveries instead of the whole backlog
+    await channel.prefetch(PREFETCH);
+    await assertRetryQueues(channel);
+    await channel.assertQueue(RESULTS_QUEUE, { durable: true });
+    await channel.bindQueue(
+      RESULTS_QUEUE,
+      "notifications.direct",
+      RESULTS_ROUTING_KEY
+    );
 
     console.log("Push service connected to RabbitMQ");
 
     // Consume messages
-    channel.consume("push.queue", async (msg) => {
+    channel.consume("push.priority.queue", async (msg) => {
       if (msg) {
         const message = JSON.parse(msg.content.toString());
 
@@ -192,30 +235,32 @@ async function connectRabbitMQ() {
             timestamp: new Date().toISOString(),
             error: null,
           };
-          redisClient.setEx(
-            `status:${message.request_id}`,
-            3600,
-            JSON.stringify(statusData)
-          );
+          publishResult(channel, statusData);
 
           channel.ack(msg);
         } catch (error) {
           console.error("Error processing push:", error);
+          try {
+            if (await scheduleRetry(channel, msg)) {
+              return;
+            }
+          } catch (retryError) {
+            // The retry copy was not confirmed; requeue the original instead
+            console.error("Failed to schedule push retry:", retryError);
+            channel.nack(msg, false, true);
+            return;
+          }
 
-          // Update status to 'failed' with error details
+          // Out of attempts: update status to 'failed' with error details
           const statusData = {
             notification_id: message.request_id,
             status: "failed",
             timestamp: new Date().toISOString(),
             error: error.message,
           };
-          redisClient.setEx(
-            `status:${message.request_id}`,
-            3600,
-            JSON.stringify(statusData)
-          );
+          publishResult(channel, statusData);
 
-          channel.nack(msg, false, false); // Don't requeue
+          channel.nack(msg, false, false); // Dead-letter to failed.queue
         }
       }
     });
@@ -0,0 +1,79 @@
+// Retry tiers, matching RABBITMQ_RETRY_* in the gateway settings: a failed
+// delivery is copied to the delay queue for its attempt, whose TTL
+// dead-letters it back to push.queue, until the attempts run out
+const RETRY_DELAYS = (process.env.RABBITMQ_RETRY_DELAYS || "5000,30000,120000,600000")
+  .split(",")
+  .filter((delay) => delay)
+  .map((delay) => parseInt(delay, 10));
+const RETRY_MAX_ATTEMPTS = parseInt(
+  process.env.RABBITMQ_RETRY_MAX_ATTEMPTS || "5",
+  10
+);
+const RETRY_COUNT_HEADER = "x-retry-count";
+const ROUTING_KEY = "push.queue";
+
+function retryQueueName(delay) {
+  return `push.retry.${delay}ms`;
+}
+
+async function assertRetryQueues(channel, delays = RETRY_DELAYS) {
+  for (const delay of delays) {
+    await channel.assertQueue(retryQueueName(delay), {
+      durable: true,
+      arguments: {
+        "x-message-ttl": delay,
+        "x-dead-letter-exchange": "notifications.direct",
+        "x-dead-letter-routing-key": ROUTING_KEY,
+      },
+    });
+  }
+}
+
+// Delay of the next retry tier for a delivery carrying these headers, or
+// null once the attempts are exhausted; the last tier repeats
+function nextRetryDelay(
+  headers,
+  delays = RETRY_DELAYS,
+  maxAttempts = RETRY_MAX_ATTEMPTS
+) {
+  const retries = parseInt((headers || {})[RETRY_COUNT_HEADER] || 0, 10);
+  if (delays.length === 0 || retries + 1 >= maxAttempts) {
+    return null;
+  }
+  return delays[Math.min(retries, delays.length - 1)];
+}
+
+// Copy a failed delivery to the next delay tier and ack it once the broker
+// confirms the copy, so a lost publish cannot drop the message. channel must
+// be a confirm channel. Resolves false once the attempts are exhausted so
+// the caller can dead-letter it; rejects, without acking, if the publish is
+// not confirmed.
+async function scheduleRetry(channel, msg, delays, maxAttempts) {
+  const headers = msg.properties.headers || {};
+  const delay = nextRetryDelay(headers, delays, maxAttempts);
+  if (delay === null) {
+    return false;
+  }
+  const retries = parseInt(headers[RETRY_COUNT_HEADER] || 0, 10);
+  await new Promise((resolve, reject) => {
+    channel.sendToQueue(
+      retryQueueName(delay),
+      msg.content,
+      {
+        ...msg.properties,
+        headers: { ...headers, [RETRY_COUNT_HEADER]: retries + 1 },
+      },
+      (err) => (err ? reject(err) : resolve())
+    );
+  });
+  channel.ack(msg);
+  return true;
+}
+
+module.exports = {
+  RETRY_COUNT_HEADER,
+  assertRetryQueues,
+  nextRetryDelay,
+  retryQueueName,
+  scheduleRetry,
+};
@@ -0,0 +1,69 @@
+const test = require("node:test");
+const assert = require("node:assert");
+
+const {
+  RETRY_COUNT_HEADER,
+  nextRetryDelay,
+  retryQueueName,
+  scheduleRetry,
+} = require("../retry");
+
+const DELAYS = [1000, 5000];
+
+function fakeChannel(publishError = null) {
+  const channel = { sent: [], acked: [] };
+  channel.sendToQueue = (queue, content, options, callback) => {
+    channel.sent.push({ queue, content, options });
+    setImmediate(() => callback(publishError));
+    return true;
+  };
+  channel.ack = (msg) => channel.acked.push(msg);
+  return channel;
+}
+
+function delivery(headers) {
+  return {
+    content: Buffer.from("{}"),
+    properties: { priority: 7, headers },
+  };
+}
+
+test("walks the retry tiers and repeats the last one", () => {
+  assert.strictEqual(nextRetryDelay(undefined, DELAYS, 4), 1000);
+  assert.strictEqual(nextRetryDelay({ [RETRY_COUNT_HEADER]: 1 }, DELAYS, 4), 5000);
+  assert.strictEqual(nextRetryDelay({ [RETRY_COUNT_HEADER]: 2 }, DELAYS, 4), 5000);
+});
+
+test("stops once the attempts are exhausted", () => {
+  assert.strictEqual(nextRetryDelay({ [RETRY_COUNT_HEADER]: 3 }, DELAYS, 4), null);
+  assert.strictEqual(nextRetryDelay({}, [], 4), null);
+});
+
+test("acks only after the retry copy is confirmed", async () => {
+  const channel = fakeChannel();
+  const msg = delivery({ [RETRY_COUNT_HEADER]: 1 });
+
+  assert.strictEqual(await scheduleRetry(channel, msg, DELAYS, 4), true);
+  assert.strictEqual(channel.sent.length, 1);
+  assert.strictEqual(channel.sent[0].queue, retryQueueName(5000));
+  assert.strictEqual(channel.sent[0].options.priority, 7);
+  assert.strictEqual(channel.sent[0].options.headers[RETRY_COUNT_HEADER], 2);
+  assert.deepStrictEqual(channel.acked, [msg]);
+});
+
+test("leaves the delivery unacked when the publish is nacked", async () => {
+  const channel = fakeChannel(new Error("nacked"));
+  const msg = delivery({});
+
+  await assert.rejects(scheduleRetry(channel, msg, DELAYS, 4), /nacked/);
+  assert.deepStrictEqual(channel.acked, []);
+});
+
+test("does not publish when out of attempts", async () => {
+  const channel = fakeChannel();
+  const msg = delivery({ [RETRY_COUNT_HEADER]: 3 });
+
+  assert.strictEqual(await scheduleRetry(channel, msg, DELAYS, 4), false);
+  assert.deepStrictEqual(channel.sent, []);
+  assert.deepStrictEqual(channel.acked, []);
+});
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TemplatesAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'templates_app'
+
+    def ready(self):
+        # Registers the render pool system check
+        from . import render_pool  # noqa: F401
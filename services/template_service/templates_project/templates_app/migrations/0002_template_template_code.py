@@ -0,0 +1,81 @@
+from django.db import migrations, models
+from django.utils.text import slugify
+
+CODE_LENGTH = 100
+
+
+def add_template_code_column(apps, schema_editor):
+    # Some deployed schemas already have template_code, added outside the
+    # migrations; keep the column and its values, only dropping its indexes
+    # so the AlterField below recreates them under the names Django expects
+    Template = apps.get_model('templates_app', 'Template')
+    connection = schema_editor.connection
+    table = Template._meta.db_table
+    with connection.cursor() as cursor:
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+        constraints = connection.introspection.get_constraints(cursor, table)
+
+    if 'template_code' not in columns:
+        field = models.CharField(max_length=CODE_LENGTH, null=True)
+        field.set_attributes_from_name('template_code')
+        field.model = Template
+        schema_editor.add_field(Template, field)
+        return
+
+    if connection.vendor != 'postgresql':
+        # Other backends rebuild the table on AlterField
+        return
+    for name, constraint in constraints.items():
+        if constraint['columns'] != ['template_code'] or constraint['primary_key']:
+            continue
+        sql = schema_editor.sql_delete_unique if constraint['unique'] else schema_editor.sql_delete_index
+        schema_editor.execute(sql % {'table': schema_editor.quote_name(table), 'name': schema_editor.quote_name(name)})
+
+
+def backfill_template_codes(apps, schema_editor):
+    """Give every template without a code, or with a duplicate one, a unique code derived from its name"""
+    Template = apps.get_model('templates_app', 'Template')
+    kept = set()
+    missing = []
+    for template in Template.objects.order_by('pk').only('pk', 'name', 'template_code'):
+        if template.template_code and template.template_code not in kept:
+            kept.add(template.template_code)
+        else:
+            missing.append(template)
+
+    for template in missing:
+        base = slugify(template.name).replace('-', '_')[:CODE_LENGTH - 30] or 'template'
+        code, attempt = base, 0
+        while code in kept:
+            attempt += 1
+            code = f"{base}_{template.pk}" if attempt == 1 else f"{base}_{template.pk}_{attempt}"
+        kept.add(code)
+        Template.objects.filter(pk=template.pk).update(template_code=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='template',
+                    name='template_code',
+                    field=models.CharField(max_length=CODE_LENGTH, null=True),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_template_code_column, migrations.RunPython.noop),
+            ],
+        ),
+        migrations.RunPython(backfill_template_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='template',
+            name='template_code',
+            field=models.CharField(default='new_template_code', max_length=CODE_LENGTH, unique=True),
+        ),
+    ]
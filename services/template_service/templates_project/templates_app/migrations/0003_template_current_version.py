@@ -0,0 +1,24 @@
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def set_current_version(apps, schema_editor):
+    Template = apps.get_model('templates_app', 'Template')
+    for template in Template.objects.annotate(latest=Max('versions__version_number')).filter(latest__isnull=False):
+        Template.objects.filter(pk=template.pk).update(current_version=template.latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates_app', '0002_template_template_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='current_version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_current_version, migrations.RunPython.noop),
+    ]
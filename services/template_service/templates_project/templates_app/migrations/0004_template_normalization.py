@@ -0,0 +1,35 @@
+# Generated by Django 4.2 on 2026-10-17 03:53
+
+from django.db import migrations, models
+
+from templates_app.processor import normalize
+
+
+def normalize_existing_content(apps, schema_editor):
+    # Historical models do not run Template.save, so normalize here
+    Template = apps.get_model('templates_app', 'Template')
+    for template in Template.objects.only('pk', 'content', 'normalization').iterator():
+        Template.objects.filter(pk=template.pk).update(
+            normalized_content=normalize(template.content, template.normalization)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates_app', '0003_template_current_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='normalization',
+            field=models.CharField(choices=[('none', 'None'), ('prettify', 'Prettify'), ('minify', 'Minify')], default='prettify', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='normalized_content',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(normalize_existing_content, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,37 @@
 from django.db import models
 import uuid
 
+from .processor import NORMALIZE_MINIFY, NORMALIZE_NONE, NORMALIZE_PRETTIFY, normalize
+from .render_cache import invalidate_template
+
+
+class Normalization(models.TextChoices):
+    none = NORMALIZE_NONE
+    prettify = NORMALIZE_PRETTIFY
+    minify = NORMALIZE_MINIFY
+
+
 class Template(models.Model):
     template_code = models.CharField(max_length=100, unique=True, default="new_template_code")
     name = models.CharField(max_length=255)
     content = models.TextField()
     language = models.CharField(max_length=10, default='en')
+    current_version = models.IntegerField(default=0)
+    normalization = models.CharField(max_length=10, choices=Normalization.choices, default=Normalization.prettify)
+    # content after normalization, computed on save so renders never parse HTML
+    normalized_content = models.TextField(blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        # Saves of other fields, such as current_version, skip the HTML parse
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'content', 'normalization'} & set(update_fields):
+            self.normalized_content = normalize(self.content, self.normalization)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'normalized_content'}
+        super().save(*args, **kwargs)
+
     def latest_version_number(self):
         last = self.versions.order_by('-version_number').first()
         return last.version_number if last else 0
@@ -20,3 +43,10 @@ class TemplateVersion(models.Model):
     version_number = models.IntegerField()
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+        if created:
+            # A new version supersedes every cached render of the template
+            invalidate_template(self.template.template_code)
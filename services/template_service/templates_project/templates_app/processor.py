@@ -1,9 +1,77 @@
 import re
+from collections import OrderedDict
+from threading import Lock
+
 from bs4 import BeautifulSoup
+from django.conf import settings
+
+PLACEHOLDER_RE = re.compile(r"{{\s*([^{}]*?)\s*}}")
+HTML_TAG_RE = re.compile(r"<[a-zA-Z!/]")
+# Blocks whose whitespace is significant; left alone when minifying
+PRESERVED_RE = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.IGNORECASE | re.DOTALL)
+BETWEEN_TAGS_RE = re.compile(r"(?<=>)\s+(?=<)|(?<=>)\s+$|^\s+(?=<)")
+WHITESPACE_RE = re.compile(r"\s+")
+
+NORMALIZE_NONE = 'none'
+NORMALIZE_PRETTIFY = 'prettify'
+NORMALIZE_MINIFY = 'minify'
+
+_compiled_cache = OrderedDict()
+_compiled_lock = Lock()
+
+
+class MissingVariableError(KeyError):
+    """Raised by a strict render when variables lack some of the template's placeholders"""
+
+    def __init__(self, names):
+        super().__init__(names)
+        self.names = names
+
+
+class CompiledTemplate:
+    """Template content parsed once into literal text and {{ var }} slots.
+
+    Rendering fills the slots and joins the parts in a single pass, so its
+    cost depends on the content size, not on the number of variables.
+    Values are inserted as str(value) and are never themselves scanned for
+    placeholders. A placeholder with no matching variable is left in the
+    output verbatim, or raises MissingVariableError when rendering strictly.
+    """
+
+    __slots__ = ('parts', 'slots', 'variables')
+
+    def __init__(self, content):
+        self.parts = []
+        self.slots = []  # (index in parts, variable name)
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(content):
+            self.parts.append(content[position:match.start()])
+            self.slots.append((len(self.parts), match.group(1)))
+            self.parts.append(match.group(0))
+            position = match.end()
+        self.parts.append(content[position:])
+        self.variables = frozenset(name for _, name in self.slots)
+
+    def missing(self, variables):
+        return sorted(self.variables.difference(variables))
+
+    def render(self, variables, strict=False):
+        if strict:
+            missing = self.missing(variables)
+            if missing:
+                raise MissingVariableError(missing)
+        parts = self.parts.copy()
+        for index, name in self.slots:
+            if name in variables:
+                parts[index] = str(variables[name])
+        return ''.join(parts)
+
+
+def looks_like_html(content):
+    return HTML_TAG_RE.search(content) is not None
+
 
-def render_template(content, variables):
-    for key, value in variables.items():
-        content = re.sub(r"{{\s*"+re.escape(key)+r"\s*}}", str(value), content)
+def prettify(content):
     # Pretty-print HTML if it's HTML content
     try:
         soup = BeautifulSoup(content, 'html.parser')
@@ -11,3 +79,72 @@ def render_template(content, variables):
     except Exception:
         # If not HTML, return as is
         return content
+
+
+def minify(content):
+    """Collapse whitespace runs and drop whitespace between tags, outside pre/textarea/script/style"""
+    parts = PRESERVED_RE.split(content)
+    minified = []
+    # split yields text, block, tag name, text, block, tag name, ...
+    for index in range(0, len(parts), 3):
+        text = BETWEEN_TAGS_RE.sub("", parts[index])
+        minified.append(WHITESPACE_RE.sub(' ', text))
+        if index + 1 < len(parts):
+            minified.append(parts[index + 1])
+    return ''.join(minified).strip()
+
+
+def normalize(content, mode):
+    """Normalize template content once, at save time; content without HTML tags is returned as is"""
+    if mode == NORMALIZE_NONE or not looks_like_html(content):
+        return content
+    if mode == NORMALIZE_MINIFY:
+        return minify(content)
+    return prettify(content)
+
+
+def template_key(template):
+    return (template.pk, template.current_version)
+
+
+def compile_template(template):
+    """The compiled form of a Template's normalized content, cached per template and version"""
+    key = template_key(template)
+    with _compiled_lock:
+        compiled = _compiled_cache.get(key)
+        if compiled is not None:
+            _compiled_cache.move_to_end(key)
+            return compiled
+
+    content = template.normalized_content
+    if not content and template.content:
+        # Rows saved before normalization was stored
+        content = normalize(template.content, template.normalization)
+    compiled = CompiledTemplate(content)
+    with _compiled_lock:
+        _compiled_cache[key] = compiled
+        while len(_compiled_cache) > settings.TEMPLATE_COMPILE_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return compiled
+
+
+def render_item(compiled, variables, strict=False):
+    """Render one variable set into a result dict carrying either 'rendered' or 'error'"""
+    if not isinstance(variables, dict):
+        return {"error": "variables must be an object"}
+    try:
+        return {"rendered": compiled.render(variables, strict=strict)}
+    except MissingVariableError as e:
+        return {"error": "Missing template variables", "missing": e.names}
+
+
+def render_many(compiled, variable_sets, strict=False):
+    """Yield one result per variable set, in order; a failed item does not stop the batch"""
+    for index, variables in enumerate(variable_sets):
+        result = render_item(compiled, variables, strict=strict)
+        result["index"] = index
+        yield result
+
+
+def render_template(content, variables, strict=False, normalization=NORMALIZE_NONE):
+    return CompiledTemplate(normalize(content, normalization)).render(variables, strict=strict)
@@ -0,0 +1,153 @@
+import json
+import time
+import hashlib
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+# Rendered output lives at render:{template_code}:{version}:{variables hash}.
+# render:lru scores every entry by its last use, and the scripts evict the
+# least recently used entries once it holds more than RENDER_CACHE_MAX_ENTRIES,
+# so the cache is bounded by the entry count times the maximum entry size.
+# render:keys:{template_code} lists a template's entries for invalidation, and
+# render:owners maps each entry back to that set so evictions can leave it.
+LRU_KEY = 'render:lru'
+STATS_KEY = 'render:stats'
+OWNERS_KEY = 'render:owners'
+
+# KEYS: entry key, lru, stats. ARGV: now
+GET_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if value then
+    redis.call('ZADD', KEYS[2], ARGV[1], KEYS[1])
+    redis.call('HINCRBY', KEYS[3], 'hits', 1)
+else
+    redis.call('HINCRBY', KEYS[3], 'misses', 1)
+end
+return value
+"""
+
+# KEYS: entry key, lru, template entry set, owners. ARGV: value, ttl, now, max entries
+SET_SCRIPT = """
+local unpack = unpack or table.unpack
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+redis.call('SADD', KEYS[3], KEYS[1])
+redis.call('EXPIRE', KEYS[3], ARGV[2])
+redis.call('HSET', KEYS[4], KEYS[1], KEYS[3])
+local overflow = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if overflow <= 0 then
+    return 0
+end
+local victims = redis.call('ZRANGE', KEYS[2], 0, overflow - 1)
+for i = 1, #victims, 500 do
+    local chunk = {unpack(victims, i, math.min(i + 499, #victims))}
+    local owners = redis.call('HMGET', KEYS[4], unpack(chunk))
+    for j = 1, #chunk do
+        if owners[j] then
+            redis.call('SREM', owners[j], chunk[j])
+        end
+    end
+    redis.call('DEL', unpack(chunk))
+    redis.call('ZREM', KEYS[2], unpack(chunk))
+    redis.call('HDEL', KEYS[4], unpack(chunk))
+end
+return #victims
+"""
+
+# KEYS: template entry set, lru, owners
+INVALIDATE_SCRIPT = """
+local unpack = unpack or table.unpack
+local entries = redis.call('SMEMBERS', KEYS[1])
+for i = 1, #entries, 500 do
+    local chunk = {unpack(entries, i, math.min(i + 499, #entries))}
+    redis.call('DEL', unpack(chunk))
+    redis.call('ZREM', KEYS[2], unpack(chunk))
+    redis.call('HDEL', KEYS[3], unpack(chunk))
+end
+redis.call('DEL', KEYS[1])
+return #entries
+"""
+
+
+def get_client():
+    return get_redis_connection('default')
+
+
+def variables_digest(variables):
+    return hashlib.sha256(json.dumps(variables, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def entry_key(template_code, version_number, variables):
+    return f"render:{template_code}:{version_number}:{variables_digest(variables)}"
+
+
+def template_entries_key(template_code):
+    return f"render:keys:{template_code}"
+
+
+def get_rendered(template_code, version_number, variables):
+    """Return cached output for these variables, or None on a miss or when Redis is unavailable"""
+    if not settings.RENDER_CACHE_ENABLED:
+        return None
+    try:
+        client = get_client()
+        value = client.register_script(GET_SCRIPT)(
+            keys=[entry_key(template_code, version_number, variables), LRU_KEY, STATS_KEY], args=[time.time()]
+        )
+    except Exception as e:
+        logger.warning(f"Render cache read failed: {e}")
+        return None
+    return value.decode() if value is not None else None
+
+
+def store_rendered(template_code, version_number, variables, rendered):
+    """Cache output unless it exceeds RENDER_CACHE_MAX_ENTRY_BYTES; returns whether it was stored"""
+    if not settings.RENDER_CACHE_ENABLED:
+        return False
+    value = rendered.encode()
+    if len(value) > settings.RENDER_CACHE_MAX_ENTRY_BYTES:
+        return False
+    try:
+        client = get_client()
+        client.register_script(SET_SCRIPT)(
+            keys=[entry_key(template_code, version_number, variables), LRU_KEY, template_entries_key(template_code),
+                  OWNERS_KEY],
+            args=[value, settings.RENDER_CACHE_TTL, time.time(), settings.RENDER_CACHE_MAX_ENTRIES]
+        )
+    except Exception as e:
+        logger.warning(f"Render cache write failed: {e}")
+        return False
+    return True
+
+
+def invalidate_template(template_code):
+    """Drop every cached render of a template; returns the number of entries removed"""
+    try:
+        client = get_client()
+        return client.register_script(INVALIDATE_SCRIPT)(
+            keys=[template_entries_key(template_code), LRU_KEY, OWNERS_KEY]
+        )
+    except Exception as e:
+        logger.warning(f"Render cache invalidation failed for {template_code}: {e}")
+        return 0
+
+
+def cache_stats():
+    client = get_client()
+    pipe = client.pipeline(transaction=False)
+    pipe.hgetall(STATS_KEY)
+    pipe.zcard(LRU_KEY)
+    counts, entries = pipe.execute()
+    hits = int(counts.get(b'hits', 0))
+    misses = int(counts.get(b'misses', 0))
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        'entries': entries,
+        'max_entries': settings.RENDER_CACHE_MAX_ENTRIES,
+    }
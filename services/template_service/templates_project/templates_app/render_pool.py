@@ -0,0 +1,117 @@
+import pickle
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+
+from django.conf import settings
+from django.core import checks
+
+from .processor import render_many
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = Lock()
+
+# Compiled templates already unpickled in this worker process, keyed by (template, version)
+_worker_templates = {}
+WORKER_TEMPLATE_LIMIT = 64
+
+
+@checks.register()
+def check_pool_settings(app_configs, **kwargs):
+    if settings.TEMPLATE_RENDER_POOL_SIZE and settings.TEMPLATE_RENDER_POOL_MIN_BATCH > settings.TEMPLATE_RENDER_BATCH_MAX:
+        return [checks.Warning(
+            "TEMPLATE_RENDER_POOL_MIN_BATCH is larger than TEMPLATE_RENDER_BATCH_MAX, "
+            "so render batches never use the process pool.",
+            hint="Lower TEMPLATE_RENDER_POOL_MIN_BATCH below TEMPLATE_RENDER_BATCH_MAX.",
+            id='templates_app.W001',
+        )]
+    return []
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.TEMPLATE_RENDER_POOL_SIZE)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_chunk(key, block_name, size, start, variable_sets, strict):
+    """Worker side: render one chunk.
+
+    The pickled template is read from the shared memory block block_name
+    only the first time this worker sees key, so chunks carry just their
+    variable sets.
+    """
+    compiled = _worker_templates.get(key)
+    if compiled is None:
+        block = shared_memory.SharedMemory(name=block_name)
+        try:
+            compiled = pickle.loads(bytes(block.buf[:size]))
+        finally:
+            block.close()
+        if len(_worker_templates) >= WORKER_TEMPLATE_LIMIT:
+            _worker_templates.clear()
+        _worker_templates[key] = compiled
+    results = list(render_many(compiled, variable_sets, strict=strict))
+    for result in results:
+        result["index"] += start
+    return results
+
+
+def render_batch(compiled, key, variable_sets, strict=False):
+    """Yield one result per variable set in input order, rendering large jobs on the process pool.
+
+    Jobs smaller than TEMPLATE_RENDER_POOL_MIN_BATCH, or any job when
+    TEMPLATE_RENDER_POOL_SIZE is 0, are rendered in process because pool
+    overhead would outweigh the gain. Otherwise the variable sets are split
+    into chunks of TEMPLATE_RENDER_POOL_CHUNK_SIZE. The compiled template is
+    pickled once per job into a shared memory block, which each worker reads
+    on first use and then keeps by key (template and version), so it is
+    never sent along with the chunks. If the pool breaks, the remaining
+    chunks are rendered in process.
+    """
+    if not settings.TEMPLATE_RENDER_POOL_SIZE or len(variable_sets) < settings.TEMPLATE_RENDER_POOL_MIN_BATCH:
+        yield from render_many(compiled, variable_sets, strict=strict)
+        return
+
+    size = settings.TEMPLATE_RENDER_POOL_CHUNK_SIZE
+    chunks = [(start, variable_sets[start:start + size]) for start in range(0, len(variable_sets), size)]
+    payload = pickle.dumps(compiled)
+    block = shared_memory.SharedMemory(create=True, size=len(payload))
+    block.buf[:len(payload)] = payload
+    pool = _get_pool()
+    futures = [
+        pool.submit(_render_chunk, key, block.name, len(payload), start, chunk, strict) for start, chunk in chunks
+    ]
+
+    try:
+        for (start, chunk), future in zip(chunks, futures):
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                logger.error("Render pool broke, rendering the rest of the batch in process")
+                shutdown_pool()
+                results = []
+                for result in render_many(compiled, chunk, strict=strict):
+                    result["index"] += start
+                    results.append(result)
+            yield from results
+    finally:
+        # A client that stops reading the stream should not leave chunks queued
+        for future in futures:
+            future.cancel()
+        block.close()
+        block.unlink()
@@ -17,19 +17,24 @@ class TemplateSerializer(serializers.ModelSerializer):
             "name",
             "content",
             "language",
+            "normalization",
+            "current_version",
             "created_at",
             "updated_at",
             "versions"
         ]
+        read_only_fields = ["current_version"]
 
     def update(self, instance, validated_data):
         # Save template update
         instance = super().update(instance, validated_data)
 
         # Create new template version
-        TemplateVersion.objects.create(
+        version = TemplateVersion.objects.create(
             template=instance,
             version_number=instance.latest_version_number() + 1,
             content=instance.content,
         )
+        instance.current_version = version.version_number
+        instance.save(update_fields=["current_version"])
         return instance
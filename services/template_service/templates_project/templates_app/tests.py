@@ -1,3 +1,361 @@
-from django.test import TestCase
+import json
+from unittest.mock import patch
 
-# Create your tests here.
+import fakeredis
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from .models import Template, TemplateVersion
+from . import processor
+from .processor import CompiledTemplate, MissingVariableError, compile_template, minify, normalize
+from .render_cache import (
+    OWNERS_KEY, cache_stats, entry_key, get_rendered, store_rendered, template_entries_key
+)
+from .render_pool import check_pool_settings, render_batch, shutdown_pool
+
+
+def clear_compiled_templates():
+    # Test databases reuse primary keys, so keys from earlier tests can collide
+    processor._compiled_cache.clear()
+
+
+class FakeRedisMixin:
+    """Point the render cache at an in-memory Redis"""
+
+    def setUp(self):
+        super().setUp()
+        self.redis = fakeredis.FakeStrictRedis()
+        patcher = patch('templates_app.render_cache.get_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class CompiledTemplateTestCase(TestCase):
+    """Test cases for the single-pass template compiler"""
+
+    def test_render_fills_placeholders_with_any_spacing(self):
+        """Test that {{var}} and {{  var  }} are both filled"""
+        compiled = CompiledTemplate("Hi {{name}}, your code is {{  code  }}.")
+        self.assertEqual(compiled.render({'name': 'Ada', 'code': 42}), "Hi Ada, your code is 42.")
+
+    def test_missing_variables_are_left_verbatim(self):
+        """Test that a placeholder without a variable stays in the output"""
+        compiled = CompiledTemplate("Hi {{ name }} {{ surname }}")
+        self.assertEqual(compiled.render({'name': 'Ada'}), "Hi Ada {{ surname }}")
+
+    def test_strict_render_reports_missing_variables(self):
+        """Test that a strict render raises with the sorted missing names"""
+        compiled = CompiledTemplate("{{ b }} {{ a }} {{ c }}")
+        with self.assertRaises(MissingVariableError) as raised:
+            compiled.render({'c': 1}, strict=True)
+        self.assertEqual(raised.exception.names, ['a', 'b'])
+
+    def test_values_are_not_rescanned_for_placeholders(self):
+        """Test that a value containing a placeholder is inserted literally"""
+        compiled = CompiledTemplate("{{ a }} {{ b }}")
+        self.assertEqual(compiled.render({'a': '{{ b }}', 'b': 'x'}), "{{ b }} x")
+
+    def test_repeated_placeholders(self):
+        """Test that every occurrence of a variable is filled"""
+        self.assertEqual(CompiledTemplate("{{ x }}-{{x}}").render({'x': 'y'}), "y-y")
+
+    def test_compiled_form_is_cached_per_version(self):
+        """Test that a template is compiled once per version"""
+        clear_compiled_templates()
+        template = Template.objects.create(template_code='welcome', name='Welcome', content='Hi {{ name }}')
+
+        compiled = compile_template(template)
+        self.assertIs(compile_template(Template.objects.get(pk=template.pk)), compiled)
+
+        template.content = 'Hello {{ name }}'
+        template.current_version = 1
+        template.save()
+        self.assertEqual(compile_template(template).render({'name': 'Ada'}), 'Hello Ada')
+
+
+class NormalizationTestCase(TestCase):
+    """Test cases for save-time HTML normalization"""
+
+    def test_plain_text_skips_parsing(self):
+        """Test that content without tags is never parsed"""
+        with patch('templates_app.processor.BeautifulSoup') as soup:
+            self.assertEqual(normalize('Hi {{ name }}\n', 'prettify'), 'Hi {{ name }}\n')
+        soup.assert_not_called()
+
+    def test_minify_keeps_preformatted_blocks(self):
+        """Test that minify collapses whitespace outside pre blocks only"""
+        html = "<div>\n  <p>Hi   {{ name }}</p>\n</div>\n<pre>a\n  b</pre>"
+        self.assertEqual(minify(html), "<div><p>Hi {{ name }}</p></div><pre>a\n  b</pre>")
+
+    def test_save_normalizes_once(self):
+        """Test that the normalized skeleton is stored and rendered without parsing"""
+        template = Template.objects.create(
+            template_code='receipt', name='Receipt', content='<p>\n  Total {{ total }}\n</p>', normalization='minify'
+        )
+        self.assertEqual(template.normalized_content, '<p> Total {{ total }} </p>')
+
+        clear_compiled_templates()
+        with patch('templates_app.processor.BeautifulSoup') as soup:
+            self.assertEqual(compile_template(template).render({'total': 3}), '<p> Total 3 </p>')
+        soup.assert_not_called()
+
+    def test_update_renormalizes(self):
+        """Test that saving only the mode still refreshes the skeleton"""
+        template = Template.objects.create(template_code='receipt', name='Receipt', content='<p>\n  x\n</p>',
+                                           normalization='none')
+        template.normalization = 'minify'
+        template.save(update_fields=['normalization'])
+        template.refresh_from_db()
+        self.assertEqual(template.normalized_content, '<p> x </p>')
+
+    def test_saving_other_fields_skips_normalization(self):
+        """Test that a save limited to other fields does not parse the content again"""
+        template = Template.objects.create(template_code='receipt', name='Receipt', content='<p>x</p>')
+        template.current_version = 2
+        with patch('templates_app.models.normalize') as normalize_content:
+            template.save(update_fields=['current_version'])
+        normalize_content.assert_not_called()
+
+
+class TemplateRenderTestCase(FakeRedisMixin, APITestCase):
+    """Test cases for the render action"""
+
+    def setUp(self):
+        super().setUp()
+        clear_compiled_templates()
+        self.template = Template.objects.create(template_code='welcome', name='Welcome', content='Hi {{ name }}')
+
+    def test_render(self):
+        """Test that render returns the filled content"""
+        response = self.client.post('/api/templates/welcome/render/', {'variables': {'name': 'Ada'}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rendered'].strip(), 'Hi Ada')
+
+    def test_strict_render_rejects_missing_variables(self):
+        """Test that a strict render answers 400 with the missing names"""
+        response = self.client.post('/api/templates/welcome/render/', {'variables': {}, 'strict': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing'], ['name'])
+
+    def test_update_renders_new_version(self):
+        """Test that an update bumps the version and the new content is rendered"""
+        response = self.client.patch('/api/templates/welcome/', {'content': 'Hello {{ name }}'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['current_version'], 1)
+
+        response = self.client.post('/api/templates/welcome/render/', {'variables': {'name': 'Ada'}}, format='json')
+        self.assertEqual(response.data['rendered'].strip(), 'Hello Ada')
+
+
+class TemplateRenderBatchTestCase(APITestCase):
+    """Test cases for the render-batch action"""
+
+    url = '/api/templates/welcome/render-batch/'
+
+    def setUp(self):
+        clear_compiled_templates()
+        Template.objects.create(template_code='welcome', name='Welcome', content='Hi {{ name }}')
+
+    def test_streams_json_array_in_order(self):
+        """Test that results come back as one JSON array in input order"""
+        response = self.client.post(self.url, {'variables': [{'name': 'Ada'}, {'name': 'Bo'}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(results, [{'rendered': 'Hi Ada', 'index': 0}, {'rendered': 'Hi Bo', 'index': 1}])
+
+    def test_ndjson_reports_per_item_errors(self):
+        """Test that NDJSON carries one line per item and bad items don't stop the batch"""
+        response = self.client.post(
+            self.url, {'variables': [{}, 'oops', {'name': 'Ada'}], 'strict': True}, format='json',
+            HTTP_ACCEPT='application/x-ndjson'
+        )
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(lines[0]['missing'], ['name'])
+        self.assertEqual(lines[1]['error'], 'variables must be an object')
+        self.assertEqual(lines[2], {'rendered': 'Hi Ada', 'index': 2})
+
+    @override_settings(TEMPLATE_RENDER_BATCH_MAX=2)
+    def test_rejects_oversized_batch(self):
+        """Test that batches over the limit are rejected before rendering"""
+        response = self.client.post(self.url, {'variables': [{}, {}, {}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_non_list(self):
+        """Test that variables must be a list"""
+        response = self.client.post(self.url, {'variables': {'name': 'Ada'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class RenderPoolTestCase(TestCase):
+    """Test cases for process-pool batch rendering"""
+
+    def tearDown(self):
+        shutdown_pool()
+
+    @override_settings(TEMPLATE_RENDER_POOL_SIZE=2, TEMPLATE_RENDER_POOL_CHUNK_SIZE=3, TEMPLATE_RENDER_POOL_MIN_BATCH=5)
+    def test_pool_keeps_input_order(self):
+        """Test that chunks rendered in workers come back in order with global indexes"""
+        compiled = CompiledTemplate('#{{ n }}')
+        variable_sets = [{'n': n} for n in range(10)] + ['oops']
+
+        results = list(render_batch(compiled, ('pool', 1), variable_sets))
+
+        self.assertEqual([result['index'] for result in results], list(range(11)))
+        self.assertEqual(results[7]['rendered'], '#7')
+        self.assertIn('error', results[10])
+
+    def test_workers_read_the_template_once(self):
+        """Test that a worker loads a template from shared memory on first use and keeps it"""
+        import pickle
+        from multiprocessing import shared_memory
+        from .render_pool import _render_chunk, _worker_templates
+
+        payload = pickle.dumps(CompiledTemplate('#{{ n }}'))
+        block = shared_memory.SharedMemory(create=True, size=len(payload))
+        block.buf[:len(payload)] = payload
+        self.addCleanup(_worker_templates.pop, ('shm', 1), None)
+
+        self.assertEqual(_render_chunk(('shm', 1), block.name, len(payload), 0, [{'n': 1}], False),
+                         [{'rendered': '#1', 'index': 0}])
+        block.close()
+        block.unlink()
+        self.assertEqual(_render_chunk(('shm', 1), block.name, len(payload), 5, [{'n': 2}], False),
+                         [{'rendered': '#2', 'index': 5}])
+
+    @override_settings(TEMPLATE_RENDER_POOL_SIZE=2, TEMPLATE_RENDER_POOL_MIN_BATCH=5)
+    def test_small_batches_render_in_process(self):
+        """Test that jobs under the minimum never start the pool"""
+        with patch('templates_app.render_pool._get_pool') as get_pool:
+            results = list(render_batch(CompiledTemplate('{{ n }}'), ('pool', 1), [{'n': 1}]))
+        get_pool.assert_not_called()
+        self.assertEqual(results, [{'rendered': '1', 'index': 0}])
+
+    @override_settings(TEMPLATE_RENDER_POOL_SIZE=2, TEMPLATE_RENDER_BATCH_MAX=1000, TEMPLATE_RENDER_POOL_MIN_BATCH=2000)
+    def test_check_warns_when_pool_is_unreachable(self):
+        """Test that a minimum above the batch limit is reported at startup"""
+        self.assertEqual([warning.id for warning in check_pool_settings(None)], ['templates_app.W001'])
+
+        with self.settings(TEMPLATE_RENDER_POOL_MIN_BATCH=250):
+            self.assertEqual(check_pool_settings(None), [])
+
+
+class RenderCacheTestCase(FakeRedisMixin, APITestCase):
+    """Test cases for the rendered-output cache"""
+
+    def setUp(self):
+        super().setUp()
+        clear_compiled_templates()
+        self.template = Template.objects.create(template_code='alert', name='Alert', content='Disk {{ disk }} full')
+
+    def render(self, variables):
+        return self.client.post('/api/templates/alert/render/', {'variables': variables}, format='json')
+
+    def test_identical_render_is_served_from_cache(self):
+        """Test that the second identical render is a hit and skips rendering"""
+        self.assertEqual(self.render({'disk': 'sda'}).data['rendered'], 'Disk sda full')
+        with patch('templates_app.processor.CompiledTemplate.render') as render:
+            self.assertEqual(self.render({'disk': 'sda'}).data['rendered'], 'Disk sda full')
+        render.assert_not_called()
+
+        stats = self.client.get('/api/render-cache/stats/').data
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+    def test_variable_order_does_not_matter(self):
+        """Test that the key hashes variables canonically"""
+        store_rendered('alert', 0, {'a': 1, 'b': 2}, 'out')
+        self.assertEqual(get_rendered('alert', 0, {'b': 2, 'a': 1}), 'out')
+
+    @override_settings(RENDER_CACHE_MAX_ENTRY_BYTES=10)
+    def test_large_outputs_are_not_cached(self):
+        """Test that outputs over the entry limit are skipped"""
+        self.assertFalse(store_rendered('alert', 0, {}, 'x' * 11))
+        self.assertIsNone(get_rendered('alert', 0, {}))
+
+    @override_settings(RENDER_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache stays within its entry bound, evicting the least recently used"""
+        store_rendered('alert', 0, {'n': 1}, 'one')
+        store_rendered('alert', 0, {'n': 2}, 'two')
+        get_rendered('alert', 0, {'n': 1})
+        store_rendered('alert', 0, {'n': 3}, 'three')
+
+        self.assertEqual(get_rendered('alert', 0, {'n': 1}), 'one')
+        self.assertIsNone(get_rendered('alert', 0, {'n': 2}))
+        self.assertEqual(cache_stats()['entries'], 2)
+
+    @override_settings(RENDER_CACHE_MAX_ENTRIES=1)
+    def test_evicted_entries_leave_their_template_set(self):
+        """Test that eviction removes the entry from its template's invalidation set"""
+        store_rendered('other', 0, {}, 'old')
+        store_rendered('alert', 0, {}, 'new')
+
+        self.assertEqual(self.redis.smembers(template_entries_key('other')), set())
+        self.assertEqual(self.redis.hkeys(OWNERS_KEY), [entry_key('alert', 0, {}).encode()])
+
+    def test_large_eviction_runs_in_chunks(self):
+        """Test that lowering the bound evicts more entries than one chunk holds"""
+        for n in range(1200):
+            store_rendered('alert', 0, {'n': n}, str(n))
+
+        with self.settings(RENDER_CACHE_MAX_ENTRIES=1):
+            store_rendered('other', 0, {}, 'kept')
+
+        self.assertEqual(cache_stats()['entries'], 1)
+        self.assertEqual(self.redis.scard(template_entries_key('alert')), 0)
+        self.assertEqual(get_rendered('other', 0, {}), 'kept')
+
+    def test_new_version_invalidates_template_entries(self):
+        """Test that creating a TemplateVersion drops the template's cached renders"""
+        store_rendered('alert', 0, {'disk': 'sda'}, 'Disk sda full')
+        store_rendered('other', 0, {}, 'kept')
+
+        TemplateVersion.objects.create(template=self.template, version_number=1, content=self.template.content)
+
+        self.assertIsNone(get_rendered('alert', 0, {'disk': 'sda'}))
+        self.assertEqual(get_rendered('other', 0, {}), 'kept')
+
+
+class TemplateETagTestCase(FakeRedisMixin, APITestCase):
+    """Test cases for the existence endpoint and conditional requests"""
+
+    def setUp(self):
+        super().setUp()
+        clear_compiled_templates()
+        self.template = Template.objects.create(template_code='welcome', name='Welcome', content='Hi {{ name }}')
+
+    def test_exists_returns_version_and_etag(self):
+        """Test that the existence check answers with the version and ETag only"""
+        response = self.client.get('/api/templates/welcome/exists/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'template_code': 'welcome', 'version': 0})
+        self.assertEqual(response['ETag'], f'"{self.template.pk}-0"')
+        self.assertEqual(response['X-Template-Version'], '0')
+
+    def test_exists_head_and_missing(self):
+        """Test that HEAD works and unknown templates are 404"""
+        self.assertEqual(self.client.head('/api/templates/welcome/exists/').status_code, 200)
+        self.assertEqual(self.client.head('/api/templates/nope/exists/').status_code, 404)
+
+    def test_retrieve_revalidates_until_updated(self):
+        """Test that retrieve answers 304 for the current ETag and 200 after an update"""
+        etag = self.client.get('/api/templates/welcome/')['ETag']
+
+        response = self.client.get('/api/templates/welcome/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+        self.client.patch('/api/templates/welcome/', {'name': 'Welcome!'}, format='json')
+        response = self.client.get('/api/templates/welcome/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_render_etag_depends_on_variables(self):
+        """Test that render revalidates per variable set"""
+        url = '/api/templates/welcome/render/'
+        etag = self.client.post(url, {'variables': {'name': 'Ada'}}, format='json')['ETag']
+
+        response = self.client.post(url, {'variables': {'name': 'Ada'}}, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.post(url, {'variables': {'name': 'Bo'}}, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -1,7 +1,10 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import TemplateViewSet
+from .views import TemplateViewSet, render_cache_stats
 
 router = DefaultRouter()
 router.register(r'templates', TemplateViewSet, basename='template')
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('render-cache/stats/', render_cache_stats, name='render-cache-stats'),
+] + router.urls
@@ -1,16 +1,74 @@
-from rest_framework import viewsets, status
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import renderers, viewsets, status
 from rest_framework.decorators import action, api_view
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from .models import Template
 from .serializers import TemplateSerializer, TemplateVersionSerializer
-from .processor import render_template
+from .processor import compile_template, template_key
+from .render_cache import cache_stats, get_rendered, invalidate_template, store_rendered, variables_digest
+from .render_pool import render_batch
 import time
 
+class NDJSONRenderer(renderers.BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode() + b"\n"
+
+
+def template_etag(template):
+    # Every content or settings change through the API creates a version
+    return f'"{template.pk}-{template.current_version}"'
+
+
+def render_etag(template, variables):
+    return f'"{template.pk}-{template.current_version}-{variables_digest(variables)[:16]}"'
+
+
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match names etag (weak comparison, as for GET)"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+def not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
 class TemplateViewSet(viewsets.ModelViewSet):
     queryset = Template.objects.all()
     serializer_class = TemplateSerializer
     lookup_field = "template_code"  # FIXED
 
+    def retrieve(self, request, *args, **kwargs):
+        template = self.get_object()
+        etag = template_etag(template)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return Response(self.get_serializer(template).data, headers={'ETag': etag})
+
+    @action(detail=True, methods=['get', 'head'])
+    def exists(self, request, template_code=None):
+        """Cheap existence check: the current version and ETag, without content or versions"""
+        template = get_object_or_404(
+            Template.objects.only('pk', 'template_code', 'current_version'), template_code=template_code
+        )
+        etag = template_etag(template)
+        headers = {'ETag': etag, 'X-Template-Version': str(template.current_version)}
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response({"template_code": template.template_code, "version": template.current_version},
+                        headers=headers)
+
     @action(detail=True, methods=['get'])
     def versions(self, request, template_code=None):
         template = self.get_object()
@@ -21,8 +79,64 @@ class TemplateViewSet(viewsets.ModelViewSet):
     def render(self, request, template_code=None):
         template = self.get_object()
         variables = request.data.get("variables", {})
-        rendered = render_template(template.content, variables)
-        return Response({"rendered": rendered})
+        etag = render_etag(template, variables)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        compiled = compile_template(template)
+        if request.data.get("strict", False):
+            missing = compiled.missing(variables)
+            if missing:
+                return Response({"error": "Missing template variables", "missing": missing},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        rendered = get_rendered(template.template_code, template.current_version, variables)
+        if rendered is None:
+            rendered = compiled.render(variables)
+            store_rendered(template.template_code, template.current_version, variables, rendered)
+        return Response({"rendered": rendered}, headers={'ETag': etag})
+
+    @action(detail=True, methods=['post'], url_path='render-batch',
+            renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer])
+    def render_batch(self, request, template_code=None):
+        """Render many variable sets against one template, streamed as a JSON array or NDJSON"""
+        variable_sets = request.data.get("variables")
+        if not isinstance(variable_sets, list):
+            return Response({"error": "variables must be a list of objects"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(variable_sets) > settings.TEMPLATE_RENDER_BATCH_MAX:
+            return Response(
+                {"error": f"Batch too large, at most {settings.TEMPLATE_RENDER_BATCH_MAX} variable sets"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        template = self.get_object()
+        results = render_batch(
+            compile_template(template), template_key(template), variable_sets, strict=request.data.get("strict", False)
+        )
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return StreamingHttpResponse(
+                (json.dumps(result) + "\n" for result in results), content_type=NDJSONRenderer.media_type
+            )
+        return StreamingHttpResponse(stream_json_array(results), content_type='application/json')
+
+    def perform_destroy(self, instance):
+        template_code = instance.template_code
+        super().perform_destroy(instance)
+        invalidate_template(template_code)
+
+
+def stream_json_array(items):
+    yield "["
+    for position, item in enumerate(items):
+        yield ("," if position else "") + json.dumps(item)
+    yield "]"
+
+
+@api_view(['GET'])
+def render_cache_stats(request):
+    try:
+        return Response(cache_stats())
+    except Exception as e:
+        return Response({"error": f"Render cache unavailable: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
 @api_view(['GET'])
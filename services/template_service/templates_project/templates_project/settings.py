@@ -150,3 +150,23 @@ CACHES = {
     }
 }
 
+# Template rendering
+# Compiled templates kept in memory per worker, keyed by template and version
+TEMPLATE_COMPILE_CACHE_SIZE = int(os.environ.get('TEMPLATE_COMPILE_CACHE_SIZE', 256))
+# Most variable sets accepted by one render-batch call
+TEMPLATE_RENDER_BATCH_MAX = int(os.environ.get('TEMPLATE_RENDER_BATCH_MAX', 1000))
+# Process pool for large render batches; 0 renders every batch in process
+TEMPLATE_RENDER_POOL_SIZE = int(os.environ.get('TEMPLATE_RENDER_POOL_SIZE', 0))
+# Variable sets sent to a pool worker at a time
+TEMPLATE_RENDER_POOL_CHUNK_SIZE = int(os.environ.get('TEMPLATE_RENDER_POOL_CHUNK_SIZE', 250))
+# Smaller batches are rendered in process even when the pool is enabled;
+# must not exceed TEMPLATE_RENDER_BATCH_MAX or the pool is never used
+TEMPLATE_RENDER_POOL_MIN_BATCH = int(os.environ.get('TEMPLATE_RENDER_POOL_MIN_BATCH', 250))
+
+# Rendered output cache in Redis, keyed by template, version and variables
+RENDER_CACHE_ENABLED = os.environ.get('RENDER_CACHE_ENABLED', 'True') == 'True'
+# Least recently used entries are evicted beyond this many
+RENDER_CACHE_MAX_ENTRIES = int(os.environ.get('RENDER_CACHE_MAX_ENTRIES', 10000))
+# Larger rendered outputs are not cached
+RENDER_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('RENDER_CACHE_MAX_ENTRY_BYTES', 65536))
+RENDER_CACHE_TTL = int(os.environ.get('RENDER_CACHE_TTL', 86400))